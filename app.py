@@ -1,7 +1,10 @@
 import streamlit as st
-from lib.database import get_database
-import bcrypt
-from datetime import datetime, timedelta
+from lib.database import (get_database, hash_password, verify_password,
+                          password_needs_rehash,
+                          SQL_UPDATE_PROFILE)
+import pandas as pd
+import hmac
+import os
 import time
 
 # Page configuration
@@ -25,62 +28,72 @@ def init_session_state():
     if "login_attempts" not in st.session_state:
         st.session_state.login_attempts = 0
     if "last_activity" not in st.session_state:
-        st.session_state.last_activity = datetime.now()
+        # Monotonic clock for the timeout arithmetic, wall clock for display
+        st.session_state.last_activity = time.monotonic()
+        st.session_state.last_activity_wall = time.time()
     if "session_id" not in st.session_state:
         st.session_state.session_id = None
-    if "cache_timestamp" not in st.session_state:
-        st.session_state.cache_timestamp = datetime.now()
+    if "cache_version" not in st.session_state:
+        st.session_state.cache_version = 0
 
 init_session_state()
 
 # Session timeout configuration
 SESSION_TIMEOUT_MINUTES = 30
 
+# Admin user list page size
+USERS_PER_PAGE = 50
+USER_ROLES = ["admin", "editor", "viewer"]
+
 # Cached user data
 @st.cache_data(ttl=300)  # Cache for 5 minutes
-def get_cached_user_schedules(user_id, cache_key):
-    """Get user schedules with caching"""
-    return db.get_user_schedules(user_id)
+def get_cached_recent_schedules(user_id, cache_key):
+    """Get user's five most recently updated schedules with caching"""
+    return db.get_recent_schedules_summary(user_id, limit=5)
 
-@st.cache_data(ttl=600)  # Cache for 10 minutes
-def get_cached_schedule(schedule_id, cache_key):
-    """Get specific schedule with caching"""
-    return db.get_schedule(schedule_id)
+@st.cache_data(ttl=300)  # Cache for 5 minutes
+def get_cached_schedule_counts(user_id, cache_key):
+    """Get user schedule counts by status with caching"""
+    return db.get_user_schedule_counts(user_id)
 
 @st.cache_data(ttl=3600)  # Cache for 1 hour
 def get_system_stats(cache_key):
     """Get system statistics with caching"""
-    with db.get_connection() as conn:
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT COUNT(*) as count FROM users")
-        total_users = cursor.fetchone()['count']
-        
-        cursor.execute("SELECT COUNT(*) as count FROM schedules")
-        total_schedules = cursor.fetchone()['count']
-        
-        cursor.execute("SELECT COUNT(*) as count FROM schedules WHERE status='finalized'")
-        finalized_schedules = cursor.fetchone()['count']
-        
-        cursor.execute("SELECT COUNT(*) as count FROM share_permissions")
-        total_shares = cursor.fetchone()['count']
-        
-        return {
-            'total_users': total_users,
-            'total_schedules': total_schedules,
-            'finalized_schedules': finalized_schedules,
-            'total_shares': total_shares
-        }
+    with db.get_connection(readonly=True) as conn:
+        # All four counts in a single round-trip
+        row = conn.execute("""
+            SELECT
+                (SELECT COUNT(*) FROM users) AS total_users,
+                (SELECT COUNT(*) FROM schedules) AS total_schedules,
+                (SELECT COUNT(*) FROM schedules WHERE status='finalized') AS finalized_schedules,
+                (SELECT COUNT(*) FROM share_permissions) AS total_shares
+        """).fetchone()
+        return dict(row)
+
+@st.cache_data(ttl=60)
+def get_schedule_activity(cache_key):
+    """Get 30-day schedule creation activity with caching"""
+    return db.get_schedule_activity(days=30)
+
+@st.cache_data(ttl=60)
+def get_db_file_sizes(cache_key):
+    """Get database and WAL file sizes in bytes with caching"""
+    db_size = os.stat(db.db_path).st_size
+    try:
+        wal_size = os.stat(db.db_path + "-wal").st_size
+    except FileNotFoundError:
+        wal_size = 0
+    return db_size, wal_size
 
 def clear_user_cache():
     """Clear user-specific cache"""
-    st.session_state.cache_timestamp = datetime.now()
+    st.session_state.cache_version += 1
 
 def check_session_timeout():
     """Check if session has timed out"""
     if st.session_state.authenticated:
-        time_elapsed = datetime.now() - st.session_state.last_activity
-        if time_elapsed > timedelta(minutes=SESSION_TIMEOUT_MINUTES):
+        time_elapsed = time.monotonic() - st.session_state.last_activity
+        if time_elapsed > SESSION_TIMEOUT_MINUTES * 60:
             logout()
             st.warning(f"Session timed out after {SESSION_TIMEOUT_MINUTES} minutes of inactivity")
             return True
@@ -88,7 +101,13 @@ def check_session_timeout():
 
 def update_activity():
     """Update last activity timestamp"""
-    st.session_state.last_activity = datetime.now()
+    st.session_state.last_activity = time.monotonic()
+    st.session_state.last_activity_wall = time.time()
+
+@st.cache_resource
+def _dummy_bcrypt_hash():
+    """Hash checked when an email is unknown so failed logins take the same time"""
+    return hash_password("x" * 32)
 
 def authenticate(email, password):
     """Authenticate user with rate limiting"""
@@ -98,7 +117,14 @@ def authenticate(email, password):
         return False
     
     user = db.get_user_by_email(email)
-    if user and bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+    # Always run bcrypt so response time doesn't reveal whether the email exists
+    hashed = user['password'] if user else _dummy_bcrypt_hash()
+    password_ok = verify_password(password, hashed)
+    if user and password_ok:
+        # Upgrade hashes made at an older cost now that we have the plaintext
+        if password_needs_rehash(user['password']):
+            user['password'] = hash_password(password)
+            db.update_password(user['id'], user['password'])
         st.session_state.authenticated = True
         st.session_state.user = user
         st.session_state.login_attempts = 0
@@ -116,13 +142,15 @@ def logout():
     st.session_state.session_id = None
     clear_user_cache()
 
+@st.cache_resource
 def create_admin_user_if_not_exists():
-    """Create default admin user from secrets"""
+    """Create default admin user from secrets (once per process)"""
     admin_email = st.secrets["app"]["admin_email"]
     admin_password = st.secrets["app"]["admin_password"]
     
     if not db.get_user_by_email(admin_email):
         db.create_user("Admin", admin_email, admin_password, role="admin")
+    return True
 
 # Create admin user on startup
 create_admin_user_if_not_exists()
@@ -131,8 +159,9 @@ create_admin_user_if_not_exists()
 if not check_session_timeout():
     update_activity()
 
-# Custom CSS
-st.markdown("""
+# Custom CSS (st.html puts a style-only payload in the event container,
+# so it takes no layout space and skips markdown parsing)
+APP_CSS = """
 <style>
     .main-header {
         font-size: 2.5rem;
@@ -171,7 +200,8 @@ st.markdown("""
         margin-left: 0.5rem;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+st.html(APP_CSS)
 
 # ==================== AUTHENTICATION PAGE ====================
 if not st.session_state.authenticated:
@@ -224,7 +254,7 @@ if not st.session_state.authenticated:
                         st.error("Please fill in all fields")
                     elif len(password) < 6:
                         st.error("Password must be at least 6 characters")
-                    elif password != confirm:
+                    elif not hmac.compare_digest(password.encode('utf-8'), confirm.encode('utf-8')):
                         st.error("Passwords don't match")
                     elif db.get_user_by_email(email):
                         st.error("Email already exists")
@@ -292,7 +322,7 @@ else:
             st.caption(f"Version: 1.0.0")
             st.caption(f"Database: SQLite")
             st.caption(f"Session timeout: {SESSION_TIMEOUT_MINUTES}m")
-            st.caption(f"Last activity: {st.session_state.last_activity.strftime('%H:%M:%S')}")
+            st.caption(f"Last activity: {time.strftime('%H:%M:%S', time.localtime(st.session_state.last_activity_wall))}")
         
         st.divider()
         
@@ -307,7 +337,7 @@ else:
         st.markdown("### System Administration Dashboard")
         
         # System statistics
-        stats = get_system_stats(st.session_state.cache_timestamp)
+        stats = get_system_stats(st.session_state.cache_version)
         
         col1, col2, col3, col4 = st.columns(4)
         with col1:
@@ -327,121 +357,123 @@ else:
         with tab1:
             st.markdown("### User Management")
             
-            col1, col2 = st.columns([2, 1])
+            col1, col2, col3 = st.columns([2, 1, 1])
             
             with col1:
                 search_user = st.text_input("🔍 Search users by email")
             
             with col2:
+                page = st.number_input("Page", min_value=1, value=1, step=1)
+            
+            with col3:
                 if st.button("🔄 Refresh Data", use_container_width=True):
                     clear_user_cache()
                     st.rerun()
             
-            # Fetch all users
-            with db.get_connection() as conn:
-                cursor = conn.cursor()
-                if search_user:
-                    cursor.execute("SELECT * FROM users WHERE email LIKE ? OR username LIKE ?", 
-                                 (f"%{search_user}%", f"%{search_user}%"))
-                else:
-                    cursor.execute("SELECT * FROM users ORDER BY created_at DESC LIMIT 50")
-                users = cursor.fetchall()
+            # Fetch one page of users with their schedule counts
+            users = db.search_users(
+                search=search_user or None,
+                limit=USERS_PER_PAGE,
+                offset=(page - 1) * USERS_PER_PAGE
+            )
             
             st.markdown(f"**Found {len(users)} users**")
             
-            for user_row in users:
-                user_data = dict(user_row)
-                
-                with st.expander(f"👤 {user_data['username']} ({user_data['email']})"):
-                    col1, col2, col3 = st.columns(3)
-                    
-                    with col1:
-                        st.write(f"**ID:** {user_data['id']}")
-                        st.write(f"**Role:** {user_data['role']}")
-                    with col2:
-                        st.write(f"**Created:** {user_data['created_at']}")
-                        schedules = db.get_user_schedules(user_data['id'])
-                        st.write(f"**Schedules:** {len(schedules)}")
-                    with col3:
-                        # Role management
-                        new_role = st.selectbox(
-                            "Change Role",
-                            ["admin", "editor", "viewer"],
-                            index=["admin", "editor", "viewer"].index(user_data['role']),
-                            key=f"role_{user_data['id']}"
-                        )
-                        
-                        if new_role != user_data['role']:
-                            if st.button("Update Role", key=f"update_{user_data['id']}"):
-                                with db.get_connection() as conn:
-                                    cursor = conn.cursor()
-                                    cursor.execute("UPDATE users SET role=? WHERE id=?",
-                                                 (new_role, user_data['id']))
-                                st.success(f"Role updated to {new_role}")
-                                time.sleep(1)
-                                st.rerun()
-                    
-                    # Delete user (except self)
-                    if user_data['id'] != user['id']:
-                        if st.button(f"🗑️ Delete User", key=f"delete_{user_data['id']}", type="secondary"):
-                            with db.get_connection() as conn:
-                                cursor = conn.cursor()
-                                # Delete user's schedules first
-                                cursor.execute("DELETE FROM schedules WHERE owner_id=?", (user_data['id'],))
-                                cursor.execute("DELETE FROM users WHERE id=?", (user_data['id'],))
-                            st.success("User deleted")
-                            clear_user_cache()
-                            time.sleep(1)
-                            st.rerun()
+            # One editable grid instead of an expander per user
+            users_df = pd.DataFrame(
+                users,
+                columns=['id', 'username', 'email', 'role', 'created_at', 'schedule_count']
+            )
+            users_df['delete'] = False
+            
+            edited_df = st.data_editor(
+                users_df,
+                column_config={
+                    'id': st.column_config.NumberColumn("ID"),
+                    'username': "Username",
+                    'email': "Email",
+                    'role': st.column_config.SelectboxColumn("Role", options=USER_ROLES, required=True),
+                    'created_at': "Created",
+                    'schedule_count': st.column_config.NumberColumn("Schedules"),
+                    'delete': st.column_config.CheckboxColumn("Delete")
+                },
+                disabled=['id', 'username', 'email', 'created_at', 'schedule_count'],
+                hide_index=True,
+                num_rows="fixed",
+                use_container_width=True,
+                key=f"users_editor_{page}_{search_user}"
+            )
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                if st.button("💾 Save Role Changes", use_container_width=True, type="primary"):
+                    changed = edited_df[edited_df['role'] != users_df['role']]
+                    for new_role, group in changed.groupby('role'):
+                        db.update_user_roles(group['id'].tolist(), new_role)
+                    st.success(f"Updated {len(changed)} role(s)")
+                    clear_user_cache()
+                    time.sleep(1)
+                    st.rerun()
+            
+            with col2:
+                if st.button("🗑️ Delete Selected", use_container_width=True, type="secondary"):
+                    # Never delete the signed-in admin
+                    delete_ids = [uid for uid in edited_df.loc[edited_df['delete'], 'id'].tolist()
+                                  if uid != user['id']]
+                    if delete_ids:
+                        db.delete_users(delete_ids)
+                        st.success(f"Deleted {len(delete_ids)} user(s)")
+                        clear_user_cache()
+                        time.sleep(1)
+                        st.rerun()
+                    else:
+                        st.warning("No users selected")
         
         # ===== SYSTEM STATISTICS =====
         with tab2:
             st.markdown("### System Statistics")
             
-            # Activity over time
-            with db.get_connection() as conn:
-                cursor = conn.cursor()
-                
-                # Schedules created per day (last 30 days)
-                cursor.execute("""
-                    SELECT DATE(created_at) as date, COUNT(*) as count
-                    FROM schedules
-                    WHERE created_at >= DATE('now', '-30 days')
-                    GROUP BY DATE(created_at)
-                    ORDER BY date DESC
-                """)
-                schedule_activity = cursor.fetchall()
-                
-                if schedule_activity:
-                    import pandas as pd
-                    import plotly.express as px
-                    
-                    df = pd.DataFrame([dict(row) for row in schedule_activity])
-                    fig = px.bar(df, x='date', y='count', 
-                               title='Schedules Created (Last 30 Days)',
-                               labels={'date': 'Date', 'count': 'Number of Schedules'})
-                    st.plotly_chart(fig, use_container_width=True)
+            # Schedules created per day (last 30 days), read from the rollup table
+            schedule_activity = get_schedule_activity(st.session_state.cache_version)
+            
+            if schedule_activity:
+                import plotly.express as px
                 
+                df = pd.DataFrame(schedule_activity)
+                fig = px.bar(df, x='date', y='count', 
+                           title='Schedules Created (Last 30 Days)',
+                           labels={'date': 'Date', 'count': 'Number of Schedules'})
+                st.plotly_chart(fig, use_container_width=True)
+            
+            with db.get_connection(readonly=True) as conn:
                 # Top users by schedule count
-                cursor.execute("""
+                top_users = conn.execute("""
                     SELECT u.username, u.email, COUNT(s.id) as schedule_count
                     FROM users u
                     LEFT JOIN schedules s ON u.id = s.owner_id
                     GROUP BY u.id
                     ORDER BY schedule_count DESC
                     LIMIT 10
-                """)
-                top_users = cursor.fetchall()
-                
-                st.markdown("#### 🏆 Top Users by Schedule Count")
-                for idx, user_row in enumerate(top_users, 1):
-                    col1, col2, col3 = st.columns([1, 3, 1])
-                    with col1:
-                        st.markdown(f"**#{idx}**")
-                    with col2:
-                        st.markdown(f"{user_row['username']} ({user_row['email']})")
-                    with col3:
-                        st.markdown(f"**{user_row['schedule_count']}** schedules")
+                """).fetchall()
+            
+            st.markdown("#### 🏆 Top Users by Schedule Count")
+            top_df = pd.DataFrame(
+                [tuple(row) for row in top_users],
+                columns=['username', 'email', 'schedule_count']
+            )
+            top_df.insert(0, 'rank', range(1, len(top_df) + 1))
+            st.dataframe(
+                top_df,
+                column_config={
+                    'rank': "#",
+                    'username': "User",
+                    'email': "Email",
+                    'schedule_count': "Schedules"
+                },
+                hide_index=True,
+                use_container_width=True
+            )
         
         # ===== SETTINGS =====
         with tab3:
@@ -449,7 +481,7 @@ else:
             
             st.markdown("#### 🗄️ Database Management")
             
-            col1, col2 = st.columns(2)
+            col1, col2, col3 = st.columns(3)
             
             with col1:
                 if st.button("🔄 Vacuum Database", use_container_width=True):
@@ -459,9 +491,16 @@ else:
             
             with col2:
                 if st.button("📊 Get DB Size", use_container_width=True):
-                    import os
-                    db_size = os.path.getsize(db.db_path) / (1024 * 1024)  # MB
-                    st.info(f"Database size: {db_size:.2f} MB")
+                    db_size, wal_size = get_db_file_sizes(st.session_state.cache_version)
+                    st.info(f"Database size: {db_size / (1024 * 1024):.2f} MB | "
+                            f"WAL: {wal_size / (1024 * 1024):.2f} MB")
+            
+            with col3:
+                if st.button("🧾 Checkpoint WAL", use_container_width=True):
+                    with db.get_connection() as conn:
+                        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                    clear_user_cache()
+                    st.success("WAL checkpointed!")
             
             st.divider()
             
@@ -486,11 +525,9 @@ else:
             st.write(f"**Member Since:** {user['created_at'][:10]}")
             
             # User statistics
-            schedules = get_cached_user_schedules(user['id'], st.session_state.cache_timestamp)
-            st.metric("My Schedules", len(schedules))
-            
-            finalized = len([s for s in schedules if s['status'] == 'finalized'])
-            st.metric("Finalized", finalized)
+            counts = get_cached_schedule_counts(user['id'], st.session_state.cache_version)
+            st.metric("My Schedules", counts['total'])
+            st.metric("Finalized", counts['finalized'])
         
         with col2:
             st.markdown("### Update Profile")
@@ -511,29 +548,24 @@ else:
                     if new_password:
                         if not current_password:
                             st.error("Enter current password to change password")
-                        elif not bcrypt.checkpw(current_password.encode('utf-8'), 
-                                               user['password'].encode('utf-8')):
+                        elif not verify_password(current_password, user['password']):
                             st.error("Current password is incorrect")
-                        elif new_password != confirm_password:
+                        elif not hmac.compare_digest(new_password.encode('utf-8'), confirm_password.encode('utf-8')):
                             st.error("New passwords don't match")
                         elif len(new_password) < 6:
                             st.error("Password must be at least 6 characters")
                         else:
                             # Update password
-                            hashed = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt())
-                            with db.get_connection() as conn:
-                                cursor = conn.cursor()
-                                cursor.execute("UPDATE users SET password=? WHERE id=?",
-                                             (hashed.decode('utf-8'), user['id']))
+                            hashed = hash_password(new_password)
+                            db.update_password(user['id'], hashed)
+                            st.session_state.user['password'] = hashed
                             st.success("Password updated!")
                             clear_user_cache()
                     
                     # Update username/email
                     if new_username != user['username'] or new_email != user['email']:
                         with db.get_connection() as conn:
-                            cursor = conn.cursor()
-                            cursor.execute("UPDATE users SET username=?, email=? WHERE id=?",
-                                         (new_username, new_email, user['id']))
+                            conn.execute(SQL_UPDATE_PROFILE, (new_username, new_email, user['id']))
                         st.success("Profile updated!")
                         
                         # Update session
@@ -551,13 +583,9 @@ else:
                 
                 confirm_delete = st.text_input("Type your email to confirm deletion")
                 if st.button("Delete My Account", type="secondary"):
-                    if confirm_delete == user['email']:
+                    if hmac.compare_digest(confirm_delete.encode('utf-8'), user['email'].encode('utf-8')):
                         # Delete user's data
-                        with db.get_connection() as conn:
-                            cursor = conn.cursor()
-                            cursor.execute("DELETE FROM schedules WHERE owner_id=?", (user['id'],))
-                            cursor.execute("DELETE FROM share_permissions WHERE user_id=?", (user['id'],))
-                            cursor.execute("DELETE FROM users WHERE id=?", (user['id'],))
+                        db.delete_user(user['id'])
                         
                         st.success("Account deleted. Goodbye! 👋")
                         logout()
@@ -574,21 +602,17 @@ else:
         st.markdown("### Welcome back, " + user['username'] + "! 👋")
         
         # Quick stats
-        schedules = get_cached_user_schedules(user['id'], st.session_state.cache_timestamp)
+        counts = get_cached_schedule_counts(user['id'], st.session_state.cache_version)
         
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("📅 Total Schedules", len(schedules))
+            st.metric("📅 Total Schedules", counts['total'])
         with col2:
-            active = len([s for s in schedules if s['status'] == 'draft'])
-            st.metric("🟡 Active", active)
+            st.metric("🟡 Active", counts['draft'])
         with col3:
-            finalized = len([s for s in schedules if s['status'] == 'finalized'])
-            st.metric("🟢 Finalized", finalized)
+            st.metric("🟢 Finalized", counts['finalized'])
         with col4:
-            # Count shared schedules
-            shared = len([s for s in schedules if s['owner_id'] != user['id']])
-            st.metric("🔗 Shared with me", shared)
+            st.metric("🔗 Shared with me", counts['shared'])
         
         st.divider()
         
@@ -625,10 +649,11 @@ else:
         st.divider()
         
         # Recent schedules
+        schedules = get_cached_recent_schedules(user['id'], st.session_state.cache_version)
         if schedules:
             st.markdown("### 📋 Recent Schedules")
             
-            for schedule in schedules[:5]:
+            for schedule in schedules:
                 with st.expander(f"📅 {schedule['title']} - {schedule['status']}"):
                     col1, col2, col3 = st.columns(3)
                     
@@ -636,8 +661,8 @@ else:
                         st.write(f"**Description:** {schedule.get('description', 'No description')}")
                         st.write(f"**Status:** {schedule['status']}")
                     with col2:
-                        st.write(f"**Entities:** {len(schedule.get('entities', []))}")
-                        st.write(f"**Constraints:** {len(schedule.get('constraints', []))}")
+                        st.write(f"**Entities:** {schedule['n_entities']}")
+                        st.write(f"**Constraints:** {schedule['n_constraints']}")
                     with col3:
                         st.write(f"**Created:** {schedule['created_at'][:10]}")
                         st.write(f"**Updated:** {schedule['updated_at'][:10]}")
@@ -1,6 +1,5 @@
 import sqlite3
 import os
-import shutil
 from datetime import datetime
 
 def backup_database():
@@ -8,7 +7,15 @@ def backup_database():
     db_path = "themis.db"
     if os.path.exists(db_path):
         backup_path = f"themis_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
-        shutil.copy2(db_path, backup_path)
+        # Online backup API gives a consistent snapshot, including WAL contents
+        src = sqlite3.connect(db_path)
+        dst = sqlite3.connect(backup_path)
+        try:
+            with dst:
+                src.backup(dst, pages=1000)
+        finally:
+            src.close()
+            dst.close()
         print(f"✅ Backup created: {backup_path}")
         return True
     return False
@@ -24,6 +31,11 @@ def fix_schedules_table():
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
+    # Match the pragmas the app uses (WAL persists in the database file)
+    cursor.execute("PRAGMA journal_mode = WAL")
+    cursor.execute("PRAGMA synchronous = NORMAL")
+    cursor.execute("PRAGMA busy_timeout = 5000")
+    
     try:
         print("\n🔧 Checking schedules table schema...")
         
@@ -37,6 +49,8 @@ def fix_schedules_table():
         required_columns = {
             'semester': 'INTEGER',
             'academic_year': 'TEXT',
+            'entities': "TEXT DEFAULT '[]'",
+            'constraints': "TEXT DEFAULT '[]'",
             'optimization_config': "TEXT DEFAULT '{}'",
             'optimization_history': "TEXT DEFAULT '[]'"
         }
@@ -66,6 +80,79 @@ def fix_schedules_table():
     finally:
         conn.close()
 
+def create_indexes():
+    """Create indexes used by the admin and home page queries"""
+    db_path = "themis.db"
+    
+    if not os.path.exists(db_path):
+        print("❌ Database not found!")
+        return
+    
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    
+    indexes = {
+        # Partial index keeps the finalized count an index-only scan
+        'ix_sched_status': "CREATE INDEX IF NOT EXISTS ix_sched_status ON schedules(status) WHERE status='finalized'",
+        # users(email) is already covered by its UNIQUE constraint
+        'ix_users_username': "CREATE INDEX IF NOT EXISTS ix_users_username ON users(username)",
+        # Owner-prefixed composites also serve plain owner_id lookups
+        'ix_sched_owner_updated': "CREATE INDEX IF NOT EXISTS ix_sched_owner_updated ON schedules(owner_id, updated_at DESC)",
+        'ix_sched_owner_status': "CREATE INDEX IF NOT EXISTS ix_sched_owner_status ON schedules(owner_id, status)",
+    }
+    
+    try:
+        print("\n🔧 Creating indexes...")
+        
+        for name, sql in indexes.items():
+            try:
+                cursor.execute(sql)
+                print(f"✅ Index ready: {name}")
+            except Exception as e:
+                print(f"⚠️ Could not create {name}: {e}")
+        
+        conn.commit()
+        
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+def enable_incremental_vacuum():
+    """Rebuild an existing database with 16 KiB pages and incremental auto-vacuum"""
+    db_path = "themis.db"
+    
+    if not os.path.exists(db_path):
+        print("❌ Database not found!")
+        return
+    
+    conn = sqlite3.connect(db_path)
+    
+    try:
+        print("\n🔧 Checking page size and auto-vacuum...")
+        
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        
+        if page_size == 16384 and auto_vacuum == 2:
+            print("✅ Already using 16 KiB pages with incremental auto-vacuum")
+            return
+        
+        # page_size can't change while in WAL mode, so VACUUM in rollback mode and switch back
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.execute("PRAGMA page_size = 16384")
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA journal_mode = WAL")
+        
+        print(f"✅ Rebuilt: page_size {page_size} → 16384, auto_vacuum {auto_vacuum} → 2 (incremental)")
+        
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+    finally:
+        conn.close()
+
 if __name__ == "__main__":
     print("=" * 60)
     print("DATABASE SCHEMA FIX TOOL")
@@ -77,6 +164,15 @@ if __name__ == "__main__":
     # Fix schema
     fix_schedules_table()
     
+    # Cascading foreign keys are added by the app itself on startup
+    # (Database._add_cascade_foreign_keys)
+    
+    # Add indexes
+    create_indexes()
+    
+    # Page size and auto-vacuum (rewrites the whole file)
+    enable_incremental_vacuum()
+    
     print("\n" + "=" * 60)
     print("You can now restart your Streamlit app!")
     print("=" * 60)
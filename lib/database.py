@@ -1,307 +1,922 @@
 import sqlite3
-import json
+import re
+import orjson
 import bcrypt
 import streamlit as st
 from datetime import datetime
-from contextlib import contextmanager
+from contextlib import contextmanager, closing
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict, OrderedDict
 import threading
+import functools
+import copy
+import atexit
+
+# Applied to every new connection. WAL lets readers proceed while a writer
+# commits; themis.db-wal and themis.db-shm must live next to themis.db.
+# page_size and auto_vacuum only take effect before the first table exists,
+# so they are applied to brand-new database files only (fix_database.py migrates old ones)
+NEW_DATABASE_PRAGMAS = (
+    "PRAGMA page_size = 16384",
+    "PRAGMA auto_vacuum = INCREMENTAL",
+)
+
+# journal_mode is persistent in the database file, so it only needs setting once
+DATABASE_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+)
+
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA foreign_keys = ON",
+)
+
+# Size of each connection's prepared-statement cache
+STATEMENT_CACHE_SIZE = 256
+# Most getter results kept by _cached_by_version; least recently used go first
+REFERENCE_CACHE_SIZE = 256
+
+# Hot queries kept as constants so the statement cache sees identical SQL
+SQL_GET_USER_BY_EMAIL = 'SELECT * FROM users WHERE email = ?'
+SQL_UPDATE_PASSWORD = 'UPDATE users SET password = ? WHERE id = ?'
+SQL_UPDATE_PROFILE = 'UPDATE users SET username = ?, email = ? WHERE id = ?'
+SQL_COUNT_STATUSES = '''
+    SELECT status, COUNT(*) AS count, 0 AS shared
+    FROM schedules WHERE owner_id = ?
+    GROUP BY status
+    UNION ALL
+    SELECT s.status, COUNT(*) AS count, COUNT(*) AS shared
+    FROM schedules s
+    JOIN share_permissions sp ON s.id = sp.schedule_id
+    WHERE sp.user_id = ?
+    GROUP BY s.status
+'''
+# Listings name only the columns callers read; created_at and the legacy JSON
+# columns superseded by child tables are never materialized
+SQL_SELECT_SUBJECTS = '''
+    SELECT id, subject_code, subject_name, subject_type, credits, theory_hours, lab_hours,
+           tutorial_hours, total_hours_per_week, requires_lab, preferred_lab_id,
+           consecutive_hours, department_id
+    FROM subjects
+'''
+# One round-trip for all three clash checks; each EXISTS probes its own
+# (entity, day_of_week, time_slot) index and stops at the first hit
+SQL_CHECK_SESSION_CONFLICTS = '''
+    SELECT
+        EXISTS (SELECT 1 FROM timetable_sessions
+                WHERE faculty_id = :faculty_id AND day_of_week = :day_of_week
+                  AND time_slot = :time_slot AND id != :id) AS faculty_conflict,
+        EXISTS (SELECT 1 FROM timetable_sessions
+                WHERE room_id = :room_id AND day_of_week = :day_of_week
+                  AND time_slot = :time_slot AND id != :id) AS room_conflict,
+        EXISTS (SELECT 1 FROM timetable_sessions
+                WHERE batch_id = :batch_id AND day_of_week = :day_of_week
+                  AND time_slot = :time_slot AND id != :id) AS batch_conflict
+'''
+SESSION_CONFLICTS = (
+    ('faculty_conflict', 'faculty_id', 'Faculty already has a class at this time'),
+    ('room_conflict', 'room_id', 'Room already occupied at this time'),
+    ('batch_conflict', 'batch_id', 'Batch already has a class at this time'),
+)
+# Hand back up to this many free pages after large deletes; a no-op unless auto_vacuum is INCREMENTAL
+SQL_INCREMENTAL_VACUUM = 'PRAGMA incremental_vacuum(1000)'
+SQL_BUMP_CACHE_VERSION = '''
+    INSERT INTO cache_versions (key, ver) VALUES (?, 1)
+    ON CONFLICT(key) DO UPDATE SET ver = ver + 1
+'''
+# Optional filters are bound as NULL rather than spliced in, so each query keeps one statement
+SQL_GET_BATCHES = '''
+    SELECT id, batch_code, batch_name, program_id, year, section, num_students, semester, is_active
+    FROM batches
+    WHERE is_active = 1
+      AND (:program_id IS NULL OR program_id = :program_id)
+      AND (:year IS NULL OR year = :year)
+    ORDER BY program_id, year, section
+'''
+SQL_GET_INFRASTRUCTURE = '''
+    SELECT id, room_code, room_name, room_type, capacity, floor, building, is_active
+    FROM infrastructure
+    WHERE is_active = 1 AND (:room_type IS NULL OR room_type = :room_type)
+'''
+SQL_GET_INFRASTRUCTURE_FACILITIES = '''
+    SELECT f.room_id, f.facility
+    FROM infrastructure_facilities f
+    JOIN infrastructure i ON i.id = f.room_id
+    WHERE i.is_active = 1 AND (:room_type IS NULL OR i.room_type = :room_type)
+    ORDER BY f.room_id, f.position
+'''
+SQL_GET_FACULTY = '''
+    SELECT id, faculty_code, faculty_name, department_id, designation, email, phone,
+           max_hours_per_week, max_hours_per_day, preferred_days, preferred_times, is_active
+    FROM faculty
+    WHERE is_active = 1 AND (:department_id IS NULL OR department_id = :department_id)
+'''
+SQL_GET_FACULTY_UNAVAILABLE_SLOTS = '''
+    SELECT u.faculty_id, u.slot
+    FROM faculty_unavailable_slots u
+    JOIN faculty f ON f.id = u.faculty_id
+    WHERE f.is_active = 1 AND (:department_id IS NULL OR f.department_id = :department_id)
+'''
+SQL_GET_ALLOCATIONS_BY_BATCH = '''
+    SELECT sa.*, 
+           s.subject_name, s.subject_code, s.total_hours_per_week, 
+           s.theory_hours, s.lab_hours, s.requires_lab,
+           f.faculty_name, f.faculty_code,
+           b.batch_name
+    FROM subject_allocation sa
+    JOIN subjects s ON sa.subject_id = s.id
+    JOIN faculty f ON sa.faculty_id = f.id
+    JOIN batches b ON sa.batch_id = b.id
+    WHERE sa.batch_id = :batch_id
+      AND (:semester IS NULL OR sa.semester = :semester)
+'''
+SQL_GET_ALLOCATIONS_BY_FACULTY = '''
+    SELECT sa.*, 
+           s.subject_name, s.subject_code, s.total_hours_per_week,
+           b.batch_name, b.num_students
+    FROM subject_allocation sa
+    JOIN subjects s ON sa.subject_id = s.id
+    JOIN batches b ON sa.batch_id = b.id
+    WHERE sa.faculty_id = :faculty_id
+      AND (:semester IS NULL OR sa.semester = :semester)
+'''
+SQL_SUM_FACULTY_HOURS = '''
+    SELECT COALESCE(SUM(s.total_hours_per_week), 0), COUNT(*)
+    FROM subject_allocation sa
+    JOIN subjects s ON sa.subject_id = s.id
+    JOIN batches b ON sa.batch_id = b.id
+    WHERE sa.faculty_id = :faculty_id
+      AND (:semester IS NULL OR sa.semester = :semester)
+'''
+# Batch ids are passed as one JSON array so the statement text never changes
+SQL_GET_ALLOCATIONS_WITH_ROOM = '''
+    SELECT sa.*, 
+           s.subject_name, s.subject_code, s.total_hours_per_week, 
+           s.theory_hours, s.lab_hours, s.requires_lab, s.preferred_lab_id,
+           i.room_name AS lab_name, i.capacity AS lab_capacity,
+           f.faculty_name, f.faculty_code,
+           b.batch_name, b.num_students
+    FROM subject_allocation sa
+    JOIN subjects s ON sa.subject_id = s.id
+    JOIN faculty f ON sa.faculty_id = f.id
+    JOIN batches b ON sa.batch_id = b.id
+    LEFT JOIN infrastructure i ON s.preferred_lab_id = i.id
+    WHERE sa.batch_id IN (SELECT value FROM json_each(:batch_ids))
+      AND (:semester IS NULL OR sa.semester = :semester)
+    ORDER BY sa.batch_id, sa.id
+'''
+
+SQL_GET_COLLABORATORS_BY_SCHEDULE = '''
+    SELECT sp.schedule_id, u.id, u.username, u.email, sp.permission, sp.shared_at
+    FROM share_permissions sp
+    JOIN users u ON u.id = sp.user_id
+    WHERE sp.schedule_id IN (SELECT value FROM json_each(:schedule_ids))
+    ORDER BY sp.schedule_id, sp.id
+'''
+SQL_INSERT_TIMETABLE_SESSION = '''
+    INSERT INTO timetable_sessions 
+    (schedule_id, subject_id, batch_id, faculty_id, room_id,
+     day_of_week, time_slot, duration, session_type)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+# Filters are appended per call; each filter combination is still one fixed statement text
+SQL_GET_TIMETABLE_SESSIONS = '''
+    SELECT ts.*,
+           s.subject_name, s.subject_code,
+           b.batch_name,
+           f.faculty_name,
+           i.room_name, i.room_code
+    FROM timetable_sessions ts
+    JOIN subjects s ON ts.subject_id = s.id
+    JOIN batches b ON ts.batch_id = b.id
+    JOIN faculty f ON ts.faculty_id = f.id
+    JOIN infrastructure i ON ts.room_id = i.id
+    WHERE 1=1
+'''
+SQL_GET_HOLIDAYS_BETWEEN = '''
+    SELECT * FROM holidays 
+    WHERE holiday_date >= ? AND holiday_date < ?
+    ORDER BY holiday_date
+'''
+
+# bcrypt work factor, read once at startup. Measured per hash: cost 10 ~75 ms,
+# 11 ~150 ms, 12 ~305 ms, 13 ~605 ms; 12 is the lowest at or above the 250 ms target
+BCRYPT_COST = int(st.secrets.get("app", {}).get("bcrypt_cost", 12))
+
+
+@st.cache_resource
+def _hash_executor():
+    """Shared worker pool for bcrypt hashing"""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="bcrypt")
+
+
+def _bcrypt_hash(password):
+    """Hash password bytes at the configured cost"""
+    return bcrypt.hashpw(password, bcrypt.gensalt(BCRYPT_COST))
+
+
+def hash_password(password):
+    """Hash a password on the shared worker pool and return the bcrypt hash bytes"""
+    return _hash_executor().submit(_bcrypt_hash, password.encode('utf-8')).result()
+
+
+def verify_password(password, hashed):
+    """Check a password against a bcrypt hash on the shared worker pool"""
+    return _hash_executor().submit(bcrypt.checkpw, password.encode('utf-8'), hashed).result()
+
+
+def password_needs_rehash(hashed):
+    """True if the hash was made with a different cost than BCRYPT_COST"""
+    # bcrypt hashes look like $2b$<cost>$<salt+hash>
+    return int(hashed.split(b'$')[2]) != BCRYPT_COST
+
+
+def _dump_json(value):
+    """Encode a value for a JSON text column (orjson, returned as str so SQLite stores TEXT)"""
+    return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode()
+
+
+def _load_json_column(value, default):
+    """Decode a JSON text column, falling back to default for NULL or malformed data"""
+    if not value:
+        return default
+    try:
+        return orjson.loads(value)
+    except orjson.JSONDecodeError:
+        return default
+
+
+def _plain_cursor(conn):
+    """Cursor that yields plain tuples instead of sqlite3.Row objects"""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    return cursor
+
+
+def _fetch_dicts(cursor):
+    """Fetch remaining rows as dicts, resolving column names once per query rather than per row"""
+    names = [column[0] for column in cursor.description]
+    return [dict(zip(names, row)) for row in cursor]
+
+
+def _has_sqlite_sequence(conn):
+    """sqlite_sequence only exists once a table with AUTOINCREMENT has been created"""
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'").fetchone() is not None
+
+
+def _date_key(date):
+    """Stored form of a date; sqlite3 binds date objects as their ISO string"""
+    return date.isoformat() if hasattr(date, 'isoformat') else date
+
+
+@functools.lru_cache(maxsize=64)
+def _update_schedule_sql(columns):
+    """UPDATE for a sorted column tuple, so equal shapes reuse one cached statement"""
+    set_clause = ''.join(f'{key} = ?, ' for key in columns)
+    return f'UPDATE schedules SET {set_clause}updated_at = ? WHERE id = ?'
+
+
+# Semester term columns on schedules; older databases kept these as a
+# [META]{json}[/META] block appended to the description
+SCHEDULE_TERM_COLUMNS = (
+    ('num_weeks', 'INTEGER DEFAULT 16'),
+    ('start_date', 'DATE'),
+    ('end_date', 'DATE'),
+)
+META_BLOCK_RE = re.compile(r'\n?\[META\](.*?)\[/META\]', re.DOTALL)
+
+
+# ON DELETE actions that older files lack; SQLite can't ALTER a foreign key,
+# so _add_cascade_foreign_keys rebuilds any table still missing them
+CASCADE_FOREIGN_KEYS = {
+    'schedules': {('owner_id', 'users'): 'ON DELETE CASCADE'},
+    'share_permissions': {('schedule_id', 'schedules'): 'ON DELETE CASCADE',
+                          ('user_id', 'users'): 'ON DELETE CASCADE'},
+    'schedule_versions': {('schedule_id', 'schedules'): 'ON DELETE CASCADE',
+                          ('created_by', 'users'): 'ON DELETE CASCADE'},
+    'college_profile': {('created_by', 'users'): 'ON DELETE SET NULL'},
+}
+# Names may be stored quoted: ALTER TABLE ... RENAME rewrites them as "name"
+_SQL_NAME = r'(?:"[^"]+"|`[^`]+`|\[[^\]]+\]|\w+)'
+CREATE_TABLE_RE = re.compile(rf'^\s*CREATE\s+TABLE\s+{_SQL_NAME}', re.IGNORECASE)
+
+
+def _foreign_key_re(column, parent):
+    """Match a FOREIGN KEY clause on column -> parent(id) that has no ON DELETE action yet"""
+    return re.compile(
+        rf'(FOREIGN\s+KEY\s*\(\s*["`\[]?{column}["`\]]?\s*\)\s*'
+        rf'REFERENCES\s+["`\[]?{parent}["`\]]?\s*\(\s*["`\[]?id["`\]]?\s*\))(?!\s*ON\s+DELETE)',
+        re.IGNORECASE)
+
+
+# Read-mostly tables whose getters are memoized; triggers bump 'table:<name>' on any change
+REFERENCE_TABLES = ('college_profile', 'departments', 'programs', 'infrastructure',
+                    'faculty', 'batches', 'subjects', 'holidays', 'faculty_leaves')
+
+
+# Whole schema as one script: executescript parses it in a single pass and
+# the explicit transaction makes it one commit instead of one per statement
+_SCHEMA_SQL = '''
+    BEGIN;
+
+    -- ============ USER MANAGEMENT ============
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        role TEXT DEFAULT 'editor',
+        preferences TEXT DEFAULT '{}',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- ============ COLLEGE PROFILE ============
+    CREATE TABLE IF NOT EXISTS college_profile (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        college_name TEXT NOT NULL,
+        academic_year TEXT,
+        semester TEXT,
+        working_days TEXT DEFAULT '["Monday","Tuesday","Wednesday","Thursday","Friday","Saturday"]',
+        time_slots TEXT DEFAULT '["09:00","10:00","11:00","12:00","13:00","14:00","15:00","16:00"]',
+        slot_duration INTEGER DEFAULT 60,
+        max_periods_per_day INTEGER DEFAULT 8,
+        created_by INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (created_by) REFERENCES users (id) ON DELETE SET NULL
+    );
+
+    -- ============ DEPARTMENTS ============
+    CREATE TABLE IF NOT EXISTS departments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        dept_code TEXT UNIQUE NOT NULL,
+        dept_name TEXT NOT NULL,
+        hod_name TEXT,
+        description TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- ============ INFRASTRUCTURE (ROOMS & LABS) ============
+    CREATE TABLE IF NOT EXISTS infrastructure (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        room_code TEXT UNIQUE NOT NULL,
+        room_name TEXT NOT NULL,
+        room_type TEXT NOT NULL,
+        capacity INTEGER NOT NULL,
+        floor INTEGER,
+        building TEXT,
+        facilities TEXT DEFAULT '[]',
+        availability TEXT DEFAULT '{}',
+        is_active BOOLEAN DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- ============ FACULTY ============
+    CREATE TABLE IF NOT EXISTS faculty (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        faculty_code TEXT UNIQUE NOT NULL,
+        faculty_name TEXT NOT NULL,
+        department_id INTEGER,
+        designation TEXT,
+        email TEXT,
+        phone TEXT,
+        max_hours_per_week INTEGER DEFAULT 18,
+        max_hours_per_day INTEGER DEFAULT 6,
+        preferred_days TEXT DEFAULT '[]',
+        preferred_times TEXT DEFAULT '[]',
+        unavailable_slots TEXT DEFAULT '[]',
+        is_active BOOLEAN DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (department_id) REFERENCES departments (id)
+    );
+
+    -- List-valued attributes live in child tables so they can be queried with
+    -- plain SQL; the old JSON columns are backfilled once and then unused
+    CREATE TABLE IF NOT EXISTS faculty_unavailable_slots (
+        faculty_id INTEGER NOT NULL,
+        slot TEXT NOT NULL,
+        PRIMARY KEY (faculty_id, slot),
+        FOREIGN KEY (faculty_id) REFERENCES faculty (id) ON DELETE CASCADE
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS infrastructure_facilities (
+        room_id INTEGER NOT NULL,
+        position INTEGER NOT NULL,
+        facility TEXT NOT NULL,
+        PRIMARY KEY (room_id, position),
+        FOREIGN KEY (room_id) REFERENCES infrastructure (id) ON DELETE CASCADE
+    ) WITHOUT ROWID;
+
+    -- ============ PROGRAMS ============
+    CREATE TABLE IF NOT EXISTS programs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        program_code TEXT UNIQUE NOT NULL,
+        program_name TEXT NOT NULL,
+        duration_years INTEGER NOT NULL,
+        department_id INTEGER,
+        description TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (department_id) REFERENCES departments (id)
+    );
+
+    -- ============ BATCHES/CLASSES ============
+    CREATE TABLE IF NOT EXISTS batches (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        batch_code TEXT UNIQUE NOT NULL,
+        batch_name TEXT NOT NULL,
+        program_id INTEGER NOT NULL,
+        year INTEGER NOT NULL,
+        section TEXT,
+        num_students INTEGER NOT NULL,
+        semester INTEGER,
+        is_active BOOLEAN DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (program_id) REFERENCES programs (id)
+    );
+
+    -- ============ SUBJECTS/COURSES ============
+    CREATE TABLE IF NOT EXISTS subjects (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        subject_code TEXT UNIQUE NOT NULL,
+        subject_name TEXT NOT NULL,
+        subject_type TEXT NOT NULL,
+        credits INTEGER,
+        theory_hours INTEGER DEFAULT 0,
+        lab_hours INTEGER DEFAULT 0,
+        tutorial_hours INTEGER DEFAULT 0,
+        total_hours_per_week INTEGER NOT NULL,
+        requires_lab BOOLEAN DEFAULT 0,
+        preferred_lab_id INTEGER,
+        consecutive_hours BOOLEAN DEFAULT 0,
+        department_id INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (preferred_lab_id) REFERENCES infrastructure (id),
+        FOREIGN KEY (department_id) REFERENCES departments (id)
+    );
+
+    -- ============ SUBJECT ALLOCATION ============
+    CREATE TABLE IF NOT EXISTS subject_allocation (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        subject_id INTEGER NOT NULL,
+        batch_id INTEGER NOT NULL,
+        faculty_id INTEGER NOT NULL,
+        semester INTEGER,
+        academic_year TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (subject_id) REFERENCES subjects (id),
+        FOREIGN KEY (batch_id) REFERENCES batches (id),
+        FOREIGN KEY (faculty_id) REFERENCES faculty (id),
+        UNIQUE(subject_id, batch_id, semester, academic_year)
+    );
+
+    -- ============ HOLIDAYS ============
+    CREATE TABLE IF NOT EXISTS holidays (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        holiday_date DATE NOT NULL,
+        holiday_name TEXT NOT NULL,
+        holiday_type TEXT,
+        description TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- ============ TIMETABLE SESSIONS ============
+    CREATE TABLE IF NOT EXISTS timetable_sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        schedule_id INTEGER,
+        subject_id INTEGER NOT NULL,
+        batch_id INTEGER NOT NULL,
+        faculty_id INTEGER NOT NULL,
+        room_id INTEGER NOT NULL,
+        day_of_week TEXT NOT NULL,
+        time_slot TEXT NOT NULL,
+        duration INTEGER DEFAULT 1,
+        session_type TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (subject_id) REFERENCES subjects (id),
+        FOREIGN KEY (batch_id) REFERENCES batches (id),
+        FOREIGN KEY (faculty_id) REFERENCES faculty (id),
+        FOREIGN KEY (room_id) REFERENCES infrastructure (id)
+    );
+
+    -- ============ SCHEDULES (MAIN CONTAINER) ============
+    CREATE TABLE IF NOT EXISTS schedules (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        description TEXT,
+        semester INTEGER,
+        academic_year TEXT,
+        num_weeks INTEGER DEFAULT 16,
+        start_date DATE,
+        end_date DATE,
+        owner_id INTEGER NOT NULL,
+        status TEXT DEFAULT 'draft',
+        entities TEXT DEFAULT '[]',
+        constraints TEXT DEFAULT '[]',
+        optimization_config TEXT DEFAULT '{}',
+        optimization_history TEXT DEFAULT '[]',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (owner_id) REFERENCES users (id) ON DELETE CASCADE
+    );
+
+    -- ============ FACULTY LEAVES ============
+    CREATE TABLE IF NOT EXISTS faculty_leaves (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        faculty_id INTEGER NOT NULL,
+        leave_date DATE NOT NULL,
+        leave_type TEXT,
+        reason TEXT,
+        substitute_faculty_id INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (faculty_id) REFERENCES faculty (id),
+        FOREIGN KEY (substitute_faculty_id) REFERENCES faculty (id)
+    );
+
+    -- ============ EVENTS/MEETINGS ============
+    CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        event_name TEXT NOT NULL,
+        event_date DATE NOT NULL,
+        start_time TEXT NOT NULL,
+        end_time TEXT NOT NULL,
+        event_type TEXT,
+        affected_batches TEXT DEFAULT '[]',
+        affected_faculty TEXT DEFAULT '[]',
+        rooms_blocked TEXT DEFAULT '[]',
+        description TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- ============ SHARE PERMISSIONS ============
+    CREATE TABLE IF NOT EXISTS share_permissions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        schedule_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        permission TEXT DEFAULT 'view',
+        shared_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (schedule_id) REFERENCES schedules (id) ON DELETE CASCADE,
+        FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+        UNIQUE(schedule_id, user_id)
+    );
+
+    -- ============ CACHE VERSIONS ============
+    CREATE TABLE IF NOT EXISTS cache_versions (
+        key TEXT PRIMARY KEY,
+        ver INTEGER NOT NULL DEFAULT 0
+    );
+
+    -- Bump a schedule's version whenever its row changes
+    CREATE TRIGGER IF NOT EXISTS trg_schedules_version_update
+    AFTER UPDATE ON schedules
+    BEGIN
+        INSERT INTO cache_versions (key, ver) VALUES ('schedule:' || NEW.id, 1)
+        ON CONFLICT(key) DO UPDATE SET ver = ver + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_schedules_version_delete
+    AFTER DELETE ON schedules
+    BEGIN
+        INSERT INTO cache_versions (key, ver) VALUES ('schedule:' || OLD.id, 1)
+        ON CONFLICT(key) DO UPDATE SET ver = ver + 1;
+    END;
+
+    -- ============ SCHEDULE ACTIVITY ROLLUP ============
+    -- Backfilled once from existing schedules; triggers keep it current after that
+    CREATE TABLE IF NOT EXISTS schedule_daily_counts (
+        date TEXT PRIMARY KEY,
+        count INTEGER NOT NULL DEFAULT 0
+    );
+
+    CREATE TRIGGER IF NOT EXISTS trg_schedules_daily_insert
+    AFTER INSERT ON schedules
+    BEGIN
+        INSERT INTO schedule_daily_counts (date, count) VALUES (DATE(NEW.created_at), 1)
+        ON CONFLICT(date) DO UPDATE SET count = count + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_schedules_daily_delete
+    AFTER DELETE ON schedules
+    BEGIN
+        UPDATE schedule_daily_counts SET count = count - 1
+        WHERE date = DATE(OLD.created_at);
+    END;
+
+    -- timetable_sessions.schedule_id predates foreign keys and SQLite cannot add
+    -- one in place, so cascade schedule deletes to sessions here instead
+    -- (share_permissions already cascades through its foreign key)
+    CREATE TRIGGER IF NOT EXISTS trg_schedules_delete_sessions
+    AFTER DELETE ON schedules
+    BEGIN
+        DELETE FROM timetable_sessions WHERE schedule_id = OLD.id;
+    END;
+
+    -- timetable_sessions takes too many writes for per-row version triggers;
+    -- its write methods bump 'table:timetable_sessions' once per statement
+    -- instead, and (rare) schedule deletes bump it here for the cascaded sessions
+    DROP TRIGGER IF EXISTS trg_timetable_sessions_version_insert;
+    DROP TRIGGER IF EXISTS trg_timetable_sessions_version_update;
+    DROP TRIGGER IF EXISTS trg_timetable_sessions_version_delete;
+    CREATE TRIGGER IF NOT EXISTS trg_schedules_delete_sessions_version
+    AFTER DELETE ON schedules
+    BEGIN
+        INSERT INTO cache_versions (key, ver) VALUES ('table:timetable_sessions', 1)
+        ON CONFLICT(key) DO UPDATE SET ver = ver + 1;
+    END;
+
+    -- ============ INDEXES ============
+    -- SQLite does not index foreign keys on its own; these cover the
+    -- filtered get_all_* reads, allocation lookups and conflict checks.
+    -- users(email) is already covered by its UNIQUE constraint.
+    CREATE INDEX IF NOT EXISTS ix_batches_program_year ON batches(program_id, year, is_active);
+    CREATE INDEX IF NOT EXISTS ix_faculty_dept ON faculty(department_id, is_active);
+    CREATE INDEX IF NOT EXISTS ix_infra_type_active ON infrastructure(room_type, is_active);
+    CREATE INDEX IF NOT EXISTS ix_subject_alloc_batch_sem ON subject_allocation(batch_id, semester);
+    CREATE INDEX IF NOT EXISTS ix_subject_alloc_faculty ON subject_allocation(faculty_id, semester);
+    CREATE INDEX IF NOT EXISTS ix_timetable_sess_sched ON timetable_sessions(schedule_id, day_of_week, time_slot);
+    CREATE INDEX IF NOT EXISTS ix_timetable_sess_faculty_slot ON timetable_sessions(faculty_id, day_of_week, time_slot);
+    CREATE INDEX IF NOT EXISTS ix_timetable_sess_room_slot ON timetable_sessions(room_id, day_of_week, time_slot);
+    CREATE INDEX IF NOT EXISTS ix_timetable_sess_batch_slot ON timetable_sessions(batch_id, day_of_week, time_slot);
+    CREATE INDEX IF NOT EXISTS ix_faculty_leaves_faculty_date ON faculty_leaves(faculty_id, leave_date);
+    CREATE INDEX IF NOT EXISTS ix_holidays_date ON holidays(holiday_date);
+
+    -- Partial indexes hold only active rows, so the unfiltered "is_active = 1"
+    -- listings can walk them instead of scanning and filtering the table
+    CREATE INDEX IF NOT EXISTS ix_faculty_active ON faculty(id) WHERE is_active = 1;
+    CREATE INDEX IF NOT EXISTS ix_infrastructure_active ON infrastructure(id) WHERE is_active = 1;
+    CREATE INDEX IF NOT EXISTS ix_batches_active ON batches(id) WHERE is_active = 1;
+''' + ''.join(f'''
+    -- Bump a reference table's version on any write, including raw SQL from pages
+    CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event.lower()}
+    AFTER {event} ON {table}
+    BEGIN
+        INSERT INTO cache_versions (key, ver) VALUES ('table:{table}', 1)
+        ON CONFLICT(key) DO UPDATE SET ver = ver + 1;
+    END;
+''' for table in REFERENCE_TABLES for event in ('INSERT', 'UPDATE', 'DELETE')) + '''
+    COMMIT;
+'''
+
+
+def _copy_rows(rows):
+    """Copy a list of flat row dicts; cheaper than deepcopy for large results"""
+    return [dict(row) for row in rows]
+
+
+def _cached_by_version(*tables, copier=copy.deepcopy):
+    """Memoize a reference-table getter until any of the tables' cache versions change"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            version = tuple(self.get_cache_version(f'table:{table}') for table in tables)
+            key = (method.__name__, args, tuple(sorted(kwargs.items())))
+            with self._reference_cache_lock:
+                cached = self._reference_cache.get(key)
+                if cached is not None:
+                    self._reference_cache.move_to_end(key)
+            if cached is None or cached[0] != version:
+                cached = (version, method(self, *args, **kwargs))
+                with self._reference_cache_lock:
+                    self._reference_cache[key] = cached
+                    self._reference_cache.move_to_end(key)
+                    if len(self._reference_cache) > REFERENCE_CACHE_SIZE:
+                        self._reference_cache.popitem(last=False)
+            # Callers mutate results (e.g. _parse_json_field), so hand out copies
+            return copier(cached[1]) if copier else cached[1]
+        return wrapper
+    return decorator
+
 
 class Database:
     """Enhanced SQLite database for College Timetable Scheduling"""
     
     _lock = threading.Lock()
+    _database_pragmas_applied = False
     
     def __init__(self):
         self.db_path = st.secrets.get("database", {}).get("path", "themis.db")
+        # One long-lived read-only connection per thread, keyed by thread id
+        self._connections = {}
+        # A single writer connection shared by all threads; SQLite allows one writer anyway
+        self._writer_conn = None
+        self._writer_lock = threading.RLock()
+        # (method, args) -> (table version, result) for _cached_by_version getters, in LRU order
+        self._reference_cache = OrderedDict()
+        self._reference_cache_lock = threading.Lock()
+        atexit.register(self.close)
         self._initialize_database()
     
-    @contextmanager
-    def get_connection(self):
-        """Thread-safe database connection"""
+    def _connect(self, readonly=False, cached_statements=STATEMENT_CACHE_SIZE):
+        """Open a tuned connection to the database file"""
+        if readonly:
+            uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                                   cached_statements=cached_statements)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                                   cached_statements=cached_statements)
+        conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+    
+    def _thread_connection(self):
+        """Get this thread's read-only connection, opening it on first use"""
+        thread_id = threading.get_ident()
+        conn = self._connections.get(thread_id)
+        if conn is None:
+            conn = self._connect(readonly=True)
+            with self._lock:
+                self._close_stale_connections()
+                self._connections[thread_id] = conn
+        return conn
+    
+    def _close_stale_connections(self):
+        """Close connections whose threads have exited"""
+        live_threads = {thread.ident for thread in threading.enumerate()}
+        for thread_id in list(self._connections):
+            if thread_id not in live_threads:
+                self._connections.pop(thread_id).close()
+    
+    def close(self):
+        """Close all pooled connections"""
         with self._lock:
-            conn = sqlite3.connect(self.db_path, check_same_thread=False)
-            conn.row_factory = sqlite3.Row
+            for conn in self._connections.values():
+                conn.close()
+            self._connections.clear()
+        with self._writer_lock:
+            if self._writer_conn is not None:
+                self._writer_conn.close()
+                self._writer_conn = None
+    
+    @contextmanager
+    def get_connection(self, readonly=False):
+        """Pooled database connection: thread-local reader or the shared writer"""
+        if readonly:
+            yield self._thread_connection()
+            return
+        
+        with self._writer_lock:
+            if self._writer_conn is None:
+                self._writer_conn = self._connect()
+            conn = self._writer_conn
             try:
                 yield conn
                 conn.commit()
             except Exception as e:
                 conn.rollback()
                 raise e
-            finally:
-                conn.close()
     
     def _initialize_database(self):
         """Create all tables for college timetable system"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # ============ USER MANAGEMENT ============
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT NOT NULL,
-                    email TEXT UNIQUE NOT NULL,
-                    password TEXT NOT NULL,
-                    role TEXT DEFAULT 'editor',
-                    preferences TEXT DEFAULT '{}',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # ============ COLLEGE PROFILE ============
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS college_profile (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    college_name TEXT NOT NULL,
-                    academic_year TEXT,
-                    semester TEXT,
-                    working_days TEXT DEFAULT '["Monday","Tuesday","Wednesday","Thursday","Friday","Saturday"]',
-                    time_slots TEXT DEFAULT '["09:00","10:00","11:00","12:00","13:00","14:00","15:00","16:00"]',
-                    slot_duration INTEGER DEFAULT 60,
-                    max_periods_per_day INTEGER DEFAULT 8,
-                    created_by INTEGER,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (created_by) REFERENCES users (id)
-                )
-            ''')
-            
-            # ============ DEPARTMENTS ============
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS departments (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    dept_code TEXT UNIQUE NOT NULL,
-                    dept_name TEXT NOT NULL,
-                    hod_name TEXT,
-                    description TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # ============ INFRASTRUCTURE (ROOMS & LABS) ============
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS infrastructure (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    room_code TEXT UNIQUE NOT NULL,
-                    room_name TEXT NOT NULL,
-                    room_type TEXT NOT NULL,
-                    capacity INTEGER NOT NULL,
-                    floor INTEGER,
-                    building TEXT,
-                    facilities TEXT DEFAULT '[]',
-                    availability TEXT DEFAULT '{}',
-                    is_active BOOLEAN DEFAULT 1,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # ============ FACULTY ============
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS faculty (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    faculty_code TEXT UNIQUE NOT NULL,
-                    faculty_name TEXT NOT NULL,
-                    department_id INTEGER,
-                    designation TEXT,
-                    email TEXT,
-                    phone TEXT,
-                    max_hours_per_week INTEGER DEFAULT 18,
-                    max_hours_per_day INTEGER DEFAULT 6,
-                    preferred_days TEXT DEFAULT '[]',
-                    preferred_times TEXT DEFAULT '[]',
-                    unavailable_slots TEXT DEFAULT '[]',
-                    is_active BOOLEAN DEFAULT 1,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (department_id) REFERENCES departments (id)
-                )
-            ''')
-            
-            # ============ PROGRAMS ============
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS programs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    program_code TEXT UNIQUE NOT NULL,
-                    program_name TEXT NOT NULL,
-                    duration_years INTEGER NOT NULL,
-                    department_id INTEGER,
-                    description TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (department_id) REFERENCES departments (id)
-                )
-            ''')
+        # The schema DDL runs once per process, so compile it on a throwaway
+        # uncached connection instead of filling the pooled writer's statement cache
+        with self._writer_lock, closing(self._connect(cached_statements=0)) as conn:
+            if not Database._database_pragmas_applied:
+                if conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0:
+                    for pragma in NEW_DATABASE_PRAGMAS:
+                        conn.execute(pragma)
+                for pragma in DATABASE_PRAGMAS:
+                    conn.execute(pragma)
+                Database._database_pragmas_applied = True
             
-            # ============ BATCHES/CLASSES ============
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS batches (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    batch_code TEXT UNIQUE NOT NULL,
-                    batch_name TEXT NOT NULL,
-                    program_id INTEGER NOT NULL,
-                    year INTEGER NOT NULL,
-                    section TEXT,
-                    num_students INTEGER NOT NULL,
-                    semester INTEGER,
-                    is_active BOOLEAN DEFAULT 1,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (program_id) REFERENCES programs (id)
-                )
-            ''')
+            # Note which one-time backfills are due before the script creates their tables
+            existing = {row['name'] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'index')")}
             
-            # ============ SUBJECTS/COURSES ============
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS subjects (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    subject_code TEXT UNIQUE NOT NULL,
-                    subject_name TEXT NOT NULL,
-                    subject_type TEXT NOT NULL,
-                    credits INTEGER,
-                    theory_hours INTEGER DEFAULT 0,
-                    lab_hours INTEGER DEFAULT 0,
-                    tutorial_hours INTEGER DEFAULT 0,
-                    total_hours_per_week INTEGER NOT NULL,
-                    requires_lab BOOLEAN DEFAULT 0,
-                    preferred_lab_id INTEGER,
-                    consecutive_hours BOOLEAN DEFAULT 0,
-                    department_id INTEGER,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (preferred_lab_id) REFERENCES infrastructure (id),
-                    FOREIGN KEY (department_id) REFERENCES departments (id)
-                )
-            ''')
+            self._add_cascade_foreign_keys(conn)
             
-            # ============ SUBJECT ALLOCATION ============
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS subject_allocation (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    subject_id INTEGER NOT NULL,
-                    batch_id INTEGER NOT NULL,
-                    faculty_id INTEGER NOT NULL,
-                    semester INTEGER,
-                    academic_year TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (subject_id) REFERENCES subjects (id),
-                    FOREIGN KEY (batch_id) REFERENCES batches (id),
-                    FOREIGN KEY (faculty_id) REFERENCES faculty (id),
-                    UNIQUE(subject_id, batch_id, semester, academic_year)
-                )
-            ''')
+            conn.executescript(_SCHEMA_SQL)
             
-            # ============ HOLIDAYS ============
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS holidays (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    holiday_date DATE NOT NULL,
-                    holiday_name TEXT NOT NULL,
-                    holiday_type TEXT,
-                    description TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # ============ TIMETABLE SESSIONS ============
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS timetable_sessions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    schedule_id INTEGER,
-                    subject_id INTEGER NOT NULL,
-                    batch_id INTEGER NOT NULL,
-                    faculty_id INTEGER NOT NULL,
-                    room_id INTEGER NOT NULL,
-                    day_of_week TEXT NOT NULL,
-                    time_slot TEXT NOT NULL,
-                    duration INTEGER DEFAULT 1,
-                    session_type TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (subject_id) REFERENCES subjects (id),
-                    FOREIGN KEY (batch_id) REFERENCES batches (id),
-                    FOREIGN KEY (faculty_id) REFERENCES faculty (id),
-                    FOREIGN KEY (room_id) REFERENCES infrastructure (id)
-                )
-            ''')
-            
-            # ============ SCHEDULES (MAIN CONTAINER) ============
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS schedules (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    description TEXT,
-                    semester INTEGER,
-                    academic_year TEXT,
-                    owner_id INTEGER NOT NULL,
-                    status TEXT DEFAULT 'draft',
-                    optimization_config TEXT DEFAULT '{}',
-                    optimization_history TEXT DEFAULT '[]',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (owner_id) REFERENCES users (id)
-                )
-            ''')
+            schedule_columns = {row['name'] for row in conn.execute('PRAGMA table_info(schedules)')}
+            if 'num_weeks' not in schedule_columns:
+                for column, definition in SCHEDULE_TERM_COLUMNS:
+                    conn.execute(f'ALTER TABLE schedules ADD COLUMN {column} {definition}')
+                self._migrate_schedule_meta(conn)
             
-            # ============ FACULTY LEAVES ============
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS faculty_leaves (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    faculty_id INTEGER NOT NULL,
-                    leave_date DATE NOT NULL,
-                    leave_type TEXT,
-                    reason TEXT,
-                    substitute_faculty_id INTEGER,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (faculty_id) REFERENCES faculty (id),
-                    FOREIGN KEY (substitute_faculty_id) REFERENCES faculty (id)
-                )
-            ''')
+            if 'faculty_unavailable_slots' not in existing:
+                conn.execute('''
+                    INSERT OR IGNORE INTO faculty_unavailable_slots (faculty_id, slot)
+                    SELECT f.id, j.value FROM faculty f, json_each(f.unavailable_slots) j
+                    WHERE json_valid(f.unavailable_slots) AND json_type(f.unavailable_slots) = 'array'
+                ''')
+                conn.execute('''
+                    INSERT INTO infrastructure_facilities (room_id, position, facility)
+                    SELECT i.id, j.key, j.value FROM infrastructure i, json_each(i.facilities) j
+                    WHERE json_valid(i.facilities) AND json_type(i.facilities) = 'array'
+                ''')
             
-            # ============ EVENTS/MEETINGS ============
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS events (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    event_name TEXT NOT NULL,
-                    event_date DATE NOT NULL,
-                    start_time TEXT NOT NULL,
-                    end_time TEXT NOT NULL,
-                    event_type TEXT,
-                    affected_batches TEXT DEFAULT '[]',
-                    affected_faculty TEXT DEFAULT '[]',
-                    rooms_blocked TEXT DEFAULT '[]',
-                    description TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
+            if 'schedule_daily_counts' not in existing:
+                conn.execute('''
+                    INSERT INTO schedule_daily_counts (date, count)
+                    SELECT DATE(created_at), COUNT(*) FROM schedules
+                    GROUP BY DATE(created_at)
+                ''')
             
-            # ============ SHARE PERMISSIONS ============
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS share_permissions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    schedule_id INTEGER NOT NULL,
-                    user_id INTEGER NOT NULL,
-                    permission TEXT DEFAULT 'view',
-                    shared_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (schedule_id) REFERENCES schedules (id),
-                    FOREIGN KEY (user_id) REFERENCES users (id),
-                    UNIQUE(schedule_id, user_id)
-                )
-            ''')
+            # Gather planner statistics once; later runs keep the existing ones
+            # and only analyze indexes added since
+            if 'sqlite_stat1' not in existing:
+                conn.execute('ANALYZE')
+            else:
+                for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall():
+                    if row['name'] not in existing:
+                        conn.execute(f'ANALYZE {row["name"]}')
             
             conn.commit()
     
+    def _add_cascade_foreign_keys(self, conn):
+        """Rebuild tables whose foreign keys predate CASCADE_FOREIGN_KEYS"""
+        rebuilds = []
+        for table, actions in CASCADE_FOREIGN_KEYS.items():
+            row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+            if row is None:
+                continue
+            new_sql = row['sql']
+            for (column, parent), action in actions.items():
+                new_sql = _foreign_key_re(column, parent).sub(rf'\1 {action}', new_sql)
+            if new_sql != row['sql']:
+                rebuilds.append((table, new_sql))
+        if not rebuilds:
+            return
+        
+        # Foreign keys must stay off while tables are swapped, and the pragma
+        # is a no-op inside a transaction
+        conn.execute('PRAGMA foreign_keys = OFF')
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for table, new_sql in rebuilds:
+                # DROP TABLE takes the table's indexes and triggers with it
+                dependents = [r['sql'] for r in conn.execute(
+                    "SELECT sql FROM sqlite_master WHERE type IN ('index', 'trigger') AND tbl_name = ? AND sql IS NOT NULL",
+                    (table,))]
+                # ...and its sqlite_sequence row, which would otherwise restart at MAX(id)
+                sequence = None
+                if _has_sqlite_sequence(conn):
+                    sequence = conn.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (table,)).fetchone()
+                conn.execute(CREATE_TABLE_RE.sub(f'CREATE TABLE {table}_new', new_sql, count=1))
+                conn.execute(f'INSERT INTO {table}_new SELECT * FROM {table}')
+                conn.execute(f'DROP TABLE {table}')
+                conn.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+                if sequence is not None:
+                    conn.execute('DELETE FROM sqlite_sequence WHERE name = ?', (table,))
+                    conn.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)', (table, sequence['seq']))
+                for sql in dependents:
+                    conn.execute(sql)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.execute('PRAGMA foreign_keys = ON')
+    
+    def _migrate_schedule_meta(self, conn):
+        """Move [META]{json}[/META] blocks out of descriptions into the term columns"""
+        updates = []
+        for row in conn.execute("SELECT id, description FROM schedules WHERE description LIKE '%[META]%'").fetchall():
+            blocks = (_load_json_column(block, None) for block in META_BLOCK_RE.findall(row['description']))
+            metadata = next((block for block in blocks if isinstance(block, dict)), None)
+            if metadata is None:
+                continue
+            updates.append((
+                META_BLOCK_RE.sub('', row['description']).rstrip('\n'),
+                metadata.get('num_weeks') or 16,
+                metadata.get('start_date'),
+                metadata.get('end_date'),
+                row['id']
+            ))
+        conn.executemany('''
+            UPDATE schedules SET description = ?, num_weeks = ?, start_date = ?, end_date = ?
+            WHERE id = ?
+        ''', updates)
+    
     # ==================== HELPER METHODS ====================
     
     def _parse_json_field(self, data, field):
         """Parse JSON string field to Python object"""
         if field in data and isinstance(data[field], str):
             try:
-                data[field] = json.loads(data[field])
+                data[field] = orjson.loads(data[field])
             except:
                 data[field] = [] if field.endswith('s') or field == 'facilities' else {}
         return data
     
+    def get_cache_version(self, key):
+        """Get current version of a cached entity (e.g. 'schedule:42')"""
+        with self.get_connection(readonly=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT ver FROM cache_versions WHERE key = ?', (key,))
+            row = cursor.fetchone()
+            return row['ver'] if row else 0
+    
     # ==================== USER OPERATIONS ====================
     
     def create_user(self, username, email, password, role="editor"):
         """Create new user"""
-        hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+        hashed = hash_password(password)
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
@@ -310,84 +925,119 @@ class Database:
             ''', (username, email, hashed.decode('utf-8'), role))
             return cursor.lastrowid
     
+    def update_password(self, user_id, hashed):
+        """Store a bcrypt hash from hash_password as TEXT"""
+        with self.get_connection() as conn:
+            cursor = conn.execute(SQL_UPDATE_PASSWORD, (hashed.decode('utf-8'), user_id))
+            return cursor.rowcount
+    
     def get_user_by_email(self, email):
         """Get user by email"""
-        with self.get_connection() as conn:
+        with self.get_connection(readonly=True) as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM users WHERE email = ?', (email,))
+            cursor.execute(SQL_GET_USER_BY_EMAIL, (email,))
             row = cursor.fetchone()
-            return dict(row) if row else None
+            if row:
+                data = dict(row)
+                # Keep the hash as bytes so bcrypt.checkpw can use it directly;
+                # older rehashes stored it as a BLOB rather than TEXT
+                if isinstance(data['password'], str):
+                    data['password'] = data['password'].encode('utf-8')
+                return data
+            return None
     
     def get_user_by_id(self, user_id):
         """Get user by ID"""
-        with self.get_connection() as conn:
+        with self.get_connection(readonly=True) as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
             row = cursor.fetchone()
             return dict(row) if row else None
     
+    def delete_user(self, user_id):
+        """Delete user; schedules and shares go with it via ON DELETE CASCADE"""
+        return self.delete_users([user_id])
+    
+    def delete_users(self, user_ids):
+        """Delete several users in one transaction"""
+        placeholders = ', '.join('?' * len(user_ids))
+        with self.get_connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            cursor = conn.execute(f'DELETE FROM users WHERE id IN ({placeholders})', list(user_ids))
+            deleted = cursor.rowcount
+            conn.execute(SQL_INCREMENTAL_VACUUM)
+            return deleted
+    
+    def update_user_roles(self, user_ids, role):
+        """Set the same role on several users"""
+        placeholders = ', '.join('?' * len(user_ids))
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'UPDATE users SET role = ? WHERE id IN ({placeholders})',
+                           [role] + list(user_ids))
+            return cursor.rowcount
+    
+    def search_users(self, search=None, limit=50, offset=0):
+        """Search users by email/username with their schedule counts"""
+        pattern = f"%{search}%" if search else None
+        with self.get_connection(readonly=True) as conn:
+            cursor = _plain_cursor(conn)
+            cursor.execute('''
+                SELECT u.id, u.username, u.email, u.role, u.created_at,
+                       COUNT(s.id) AS schedule_count
+                FROM users u
+                LEFT JOIN schedules s ON s.owner_id = u.id
+                WHERE (? IS NULL OR u.email LIKE ? OR u.username LIKE ?)
+                GROUP BY u.id
+                ORDER BY u.created_at DESC
+                LIMIT ? OFFSET ?
+            ''', (pattern, pattern, pattern, limit, offset))
+            return _fetch_dicts(cursor)
+    
     # ==================== COLLEGE PROFILE ====================
     
     def create_or_update_college_profile(self, data, user_id):
         """Create or update college profile"""
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Check if profile exists
-            cursor.execute('SELECT id FROM college_profile LIMIT 1')
-            existing = cursor.fetchone()
-            
-            if existing:
-                cursor.execute('''
-                    UPDATE college_profile SET
-                        college_name = ?,
-                        academic_year = ?,
-                        semester = ?,
-                        working_days = ?,
-                        time_slots = ?,
-                        slot_duration = ?,
-                        max_periods_per_day = ?,
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (
-                    data['college_name'],
-                    data['academic_year'],
-                    data['semester'],
-                    json.dumps(data['working_days']),
-                    json.dumps(data['time_slots']),
-                    data['slot_duration'],
-                    data['max_periods_per_day'],
-                    existing['id']
-                ))
-                return existing['id']
-            else:
-                cursor.execute('''
-                    INSERT INTO college_profile 
-                    (college_name, academic_year, semester, working_days, time_slots, 
-                     slot_duration, max_periods_per_day, created_by)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    data['college_name'],
-                    data['academic_year'],
-                    data['semester'],
-                    json.dumps(data['working_days']),
-                    json.dumps(data['time_slots']),
-                    data['slot_duration'],
-                    data['max_periods_per_day'],
-                    user_id
-                ))
-                return cursor.lastrowid
+            # Single-statement upsert onto the one profile row (id 1 when none exists yet)
+            cursor = conn.execute('''
+                INSERT INTO college_profile 
+                (id, college_name, academic_year, semester, working_days, time_slots, 
+                 slot_duration, max_periods_per_day, created_by)
+                VALUES (COALESCE((SELECT id FROM college_profile LIMIT 1), 1), ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    college_name = excluded.college_name,
+                    academic_year = excluded.academic_year,
+                    semester = excluded.semester,
+                    working_days = excluded.working_days,
+                    time_slots = excluded.time_slots,
+                    slot_duration = excluded.slot_duration,
+                    max_periods_per_day = excluded.max_periods_per_day,
+                    updated_at = CURRENT_TIMESTAMP
+                RETURNING id
+            ''', (
+                data['college_name'],
+                data['academic_year'],
+                data['semester'],
+                _dump_json(data['working_days']),
+                _dump_json(data['time_slots']),
+                data['slot_duration'],
+                data['max_periods_per_day'],
+                user_id
+            ))
+            return cursor.fetchone()['id']
     
+    @_cached_by_version('college_profile')
     def get_college_profile(self):
         """Get college profile"""
-        with self.get_connection() as conn:
+        with self.get_connection(readonly=True) as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM college_profile LIMIT 1')
             row = cursor.fetchone()
             if row:
                 data = dict(row)
-                data = self._parse_json_field(data, 'working_days')
-                data = self._parse_json_field(data, 'time_slots')
+                data['working_days'] = _load_json_column(data['working_days'], [])
+                data['time_slots'] = _load_json_column(data['time_slots'], [])
                 return data
             return None
     
@@ -403,16 +1053,18 @@ class Database:
             ''', (dept_code, dept_name, hod_name, description))
             return cursor.lastrowid
     
+    @_cached_by_version('departments')
     def get_all_departments(self):
         """Get all departments"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+        with self.get_connection(readonly=True) as conn:
+            cursor = _plain_cursor(conn)
             cursor.execute('SELECT * FROM departments ORDER BY dept_name')
-            return [dict(row) for row in cursor.fetchall()]
+            return _fetch_dicts(cursor)
     
+    @_cached_by_version('departments')
     def get_department(self, dept_id):
         """Get department by ID"""
-        with self.get_connection() as conn:
+        with self.get_connection(readonly=True) as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM departments WHERE id = ?', (dept_id,))
             row = cursor.fetchone()
@@ -422,82 +1074,115 @@ class Database:
     
     def create_infrastructure(self, data):
         """Create classroom or lab"""
+        return self.create_infrastructure_bulk([data])[0]
+    
+    def create_infrastructure_bulk(self, rows):
+        """Create many rooms/labs in a single transaction; returns the new ids in order"""
+        params = [(
+            data['room_code'],
+            data['room_name'],
+            data['room_type'],
+            data['capacity'],
+            data.get('floor'),
+            data.get('building')
+        ) for data in rows]
+        if not params:
+            return []
+        
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
+            conn.executemany('''
                 INSERT INTO infrastructure 
-                (room_code, room_name, room_type, capacity, floor, building, facilities)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                data['room_code'],
-                data['room_name'],
-                data['room_type'],
-                data['capacity'],
-                data.get('floor'),
-                data.get('building'),
-                json.dumps(data.get('facilities', []))
-            ))
-            return cursor.lastrowid
-    
+                (room_code, room_name, room_type, capacity, floor, building)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', params)
+            # AUTOINCREMENT ids are contiguous while we hold the writer connection
+            last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+            ids = list(range(last_id - len(params) + 1, last_id + 1))
+            
+            conn.executemany(
+                'INSERT INTO infrastructure_facilities (room_id, position, facility) VALUES (?, ?, ?)',
+                [(room_id, position, facility)
+                 for room_id, data in zip(ids, rows)
+                 for position, facility in enumerate(data.get('facilities', []))]
+            )
+            return ids
+    
+    @_cached_by_version('infrastructure')
     def get_all_infrastructure(self, room_type=None):
         """Get all rooms/labs"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            if room_type:
-                cursor.execute('SELECT * FROM infrastructure WHERE room_type = ? AND is_active = 1', (room_type,))
-            else:
-                cursor.execute('SELECT * FROM infrastructure WHERE is_active = 1')
+        with self.get_connection(readonly=True) as conn:
+            cursor = _plain_cursor(conn)
+            params = {'room_type': room_type or None}
             
-            results = []
-            for row in cursor.fetchall():
-                data = dict(row)
-                data = self._parse_json_field(data, 'facilities')
-                results.append(data)
-            return results
+            facilities = defaultdict(list)
+            cursor.execute(SQL_GET_INFRASTRUCTURE_FACILITIES, params)
+            for room_id, facility in cursor.fetchall():
+                facilities[room_id].append(facility)
+            
+            cursor.execute(SQL_GET_INFRASTRUCTURE, params)
+            return [{**row, 'facilities': facilities[row['id']]}
+                    for row in _fetch_dicts(cursor)]
     
     # ==================== FACULTY OPERATIONS ====================
     
     def create_faculty(self, data):
         """Create faculty member"""
+        return self.create_faculty_bulk([data])[0]
+    
+    def create_faculty_bulk(self, rows):
+        """Create many faculty members in a single transaction; returns the new ids in order"""
+        params = [(
+            data['faculty_code'],
+            data['faculty_name'],
+            data.get('department_id'),
+            data.get('designation'),
+            data.get('email'),
+            data.get('phone'),
+            data.get('max_hours_per_week', 18),
+            data.get('max_hours_per_day', 6),
+            _dump_json(data.get('preferred_days', [])),
+            _dump_json(data.get('preferred_times', []))
+        ) for data in rows]
+        if not params:
+            return []
+        
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
+            conn.executemany('''
                 INSERT INTO faculty 
                 (faculty_code, faculty_name, department_id, designation, email, phone,
-                 max_hours_per_week, max_hours_per_day, preferred_days, preferred_times, unavailable_slots)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                data['faculty_code'],
-                data['faculty_name'],
-                data.get('department_id'),
-                data.get('designation'),
-                data.get('email'),
-                data.get('phone'),
-                data.get('max_hours_per_week', 18),
-                data.get('max_hours_per_day', 6),
-                json.dumps(data.get('preferred_days', [])),
-                json.dumps(data.get('preferred_times', [])),
-                json.dumps(data.get('unavailable_slots', []))
-            ))
-            return cursor.lastrowid
-    
+                 max_hours_per_week, max_hours_per_day, preferred_days, preferred_times)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', params)
+            # AUTOINCREMENT ids are contiguous while we hold the writer connection
+            last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+            ids = list(range(last_id - len(params) + 1, last_id + 1))
+            
+            conn.executemany(
+                'INSERT OR IGNORE INTO faculty_unavailable_slots (faculty_id, slot) VALUES (?, ?)',
+                [(faculty_id, slot)
+                 for faculty_id, data in zip(ids, rows)
+                 for slot in data.get('unavailable_slots', [])]
+            )
+            return ids
+    
+    @_cached_by_version('faculty')
     def get_all_faculty(self, department_id=None):
         """Get all faculty"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            if department_id:
-                cursor.execute('SELECT * FROM faculty WHERE department_id = ? AND is_active = 1', (department_id,))
-            else:
-                cursor.execute('SELECT * FROM faculty WHERE is_active = 1')
+        with self.get_connection(readonly=True) as conn:
+            cursor = _plain_cursor(conn)
+            params = {'department_id': department_id or None}
             
-            results = []
-            for row in cursor.fetchall():
-                data = dict(row)
-                data = self._parse_json_field(data, 'preferred_days')
-                data = self._parse_json_field(data, 'preferred_times')
-                data = self._parse_json_field(data, 'unavailable_slots')
-                results.append(data)
-            return results
+            unavailable = defaultdict(list)
+            cursor.execute(SQL_GET_FACULTY_UNAVAILABLE_SLOTS, params)
+            for faculty_id, slot in cursor.fetchall():
+                unavailable[faculty_id].append(slot)
+            
+            cursor.execute(SQL_GET_FACULTY, params)
+            return [{**row,
+                     'preferred_days': _load_json_column(row['preferred_days'], []),
+                     'preferred_times': _load_json_column(row['preferred_times'], []),
+                     'unavailable_slots': unavailable[row['id']]}
+                    for row in _fetch_dicts(cursor)]
     
         # ==================== PROGRAM OPERATIONS ====================
     
@@ -518,19 +1203,21 @@ class Database:
             ))
             return cursor.lastrowid
     
+    @_cached_by_version('programs')
     def get_all_programs(self, department_id=None):
         """Get all programs"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+        with self.get_connection(readonly=True) as conn:
+            cursor = _plain_cursor(conn)
             if department_id:
                 cursor.execute('SELECT * FROM programs WHERE department_id = ?', (department_id,))
             else:
                 cursor.execute('SELECT * FROM programs ORDER BY program_name')
-            return [dict(row) for row in cursor.fetchall()]
+            return _fetch_dicts(cursor)
     
+    @_cached_by_version('programs')
     def get_program(self, program_id):
         """Get program by ID"""
-        with self.get_connection() as conn:
+        with self.get_connection(readonly=True) as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM programs WHERE id = ?', (program_id,))
             row = cursor.fetchone()
@@ -540,43 +1227,49 @@ class Database:
     
     def create_batch(self, data):
         """Create batch/class"""
+        return self.create_batches_bulk([data])[0]
+    
+    def create_batches_bulk(self, rows):
+        """Create many batches in a single transaction; returns the new ids in order"""
+        params = [(
+            data['batch_code'],
+            data['batch_name'],
+            data['program_id'],
+            data['year'],
+            data.get('section'),
+            data['num_students'],
+            data.get('semester')
+        ) for data in rows]
+        if not params:
+            return []
+        
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
+            conn.executemany('''
                 INSERT INTO batches 
                 (batch_code, batch_name, program_id, year, section, num_students, semester)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                data['batch_code'],
-                data['batch_name'],
-                data['program_id'],
-                data['year'],
-                data.get('section'),
-                data['num_students'],
-                data.get('semester')
-            ))
-            return cursor.lastrowid
+            ''', params)
+            # AUTOINCREMENT ids are contiguous while we hold the writer connection
+            last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+            return list(range(last_id - len(params) + 1, last_id + 1))
     
+    @_cached_by_version('batches')
     def get_all_batches(self, program_id=None, year=None):
         """Get all batches"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+        with self.get_connection(readonly=True) as conn:
+            cursor = _plain_cursor(conn)
             
-            if program_id and year:
-                cursor.execute('SELECT * FROM batches WHERE program_id = ? AND year = ? AND is_active = 1', 
-                             (program_id, year))
-            elif program_id:
-                cursor.execute('SELECT * FROM batches WHERE program_id = ? AND is_active = 1', (program_id,))
-            elif year:
-                cursor.execute('SELECT * FROM batches WHERE year = ? AND is_active = 1', (year,))
-            else:
-                cursor.execute('SELECT * FROM batches WHERE is_active = 1 ORDER BY program_id, year, section')
+            cursor.execute(SQL_GET_BATCHES, {
+                'program_id': program_id or None,
+                'year': year or None
+            })
             
-            return [dict(row) for row in cursor.fetchall()]
+            return _fetch_dicts(cursor)
     
+    @_cached_by_version('batches')
     def get_batch(self, batch_id):
         """Get batch by ID"""
-        with self.get_connection() as conn:
+        with self.get_connection(readonly=True) as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM batches WHERE id = ?', (batch_id,))
             row = cursor.fetchone()
@@ -584,7 +1277,7 @@ class Database:
     
     def get_batch_with_details(self, batch_id):
         """Get batch with program details"""
-        with self.get_connection() as conn:
+        with self.get_connection(readonly=True) as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT b.*, p.program_name, p.program_code
@@ -595,47 +1288,71 @@ class Database:
             row = cursor.fetchone()
             return dict(row) if row else None
     
+    def get_all_batches_with_details(self):
+        """Get all active batches with program details in one query"""
+        with self.get_connection(readonly=True) as conn:
+            cursor = _plain_cursor(conn)
+            cursor.execute('''
+                SELECT b.*, p.program_name, p.program_code
+                FROM batches b
+                JOIN programs p ON b.program_id = p.id
+                WHERE b.is_active = 1
+                ORDER BY b.program_id, b.year, b.section
+            ''')
+            return _fetch_dicts(cursor)
+    
     # ==================== SUBJECT OPERATIONS ====================
     
     def create_subject(self, data):
         """Create subject/course"""
+        return self.create_subjects_bulk([data])[0]
+    
+    def create_subjects_bulk(self, rows):
+        """Create many subjects in a single transaction; returns the new ids in order"""
+        params = [(
+            data['subject_code'],
+            data['subject_name'],
+            data['subject_type'],
+            data.get('credits'),
+            data.get('theory_hours', 0),
+            data.get('lab_hours', 0),
+            data.get('tutorial_hours', 0),
+            data['total_hours_per_week'],
+            data.get('requires_lab', 0),
+            data.get('preferred_lab_id'),
+            data.get('consecutive_hours', 0),
+            data.get('department_id')
+        ) for data in rows]
+        if not params:
+            return []
+        
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
+            conn.executemany('''
                 INSERT INTO subjects 
                 (subject_code, subject_name, subject_type, credits, theory_hours, lab_hours, 
                  tutorial_hours, total_hours_per_week, requires_lab, preferred_lab_id, 
                  consecutive_hours, department_id)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                data['subject_code'],
-                data['subject_name'],
-                data['subject_type'],
-                data.get('credits'),
-                data.get('theory_hours', 0),
-                data.get('lab_hours', 0),
-                data.get('tutorial_hours', 0),
-                data['total_hours_per_week'],
-                data.get('requires_lab', 0),
-                data.get('preferred_lab_id'),
-                data.get('consecutive_hours', 0),
-                data.get('department_id')
-            ))
-            return cursor.lastrowid
+            ''', params)
+            # AUTOINCREMENT ids are contiguous while we hold the writer connection
+            last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+            return list(range(last_id - len(params) + 1, last_id + 1))
     
+    @_cached_by_version('subjects')
     def get_all_subjects(self, department_id=None):
         """Get all subjects"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+        with self.get_connection(readonly=True) as conn:
+            cursor = _plain_cursor(conn)
             if department_id:
-                cursor.execute('SELECT * FROM subjects WHERE department_id = ?', (department_id,))
+                cursor.execute(SQL_SELECT_SUBJECTS + ' WHERE department_id = ?', (department_id,))
             else:
-                cursor.execute('SELECT * FROM subjects ORDER BY subject_name')
-            return [dict(row) for row in cursor.fetchall()]
+                cursor.execute(SQL_SELECT_SUBJECTS + ' ORDER BY subject_name')
+            return _fetch_dicts(cursor)
     
+    @_cached_by_version('subjects')
     def get_subject(self, subject_id):
         """Get subject by ID"""
-        with self.get_connection() as conn:
+        with self.get_connection(readonly=True) as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM subjects WHERE id = ?', (subject_id,))
             row = cursor.fetchone()
@@ -643,7 +1360,7 @@ class Database:
     
     def get_subject_with_lab(self, subject_id):
         """Get subject with lab details"""
-        with self.get_connection() as conn:
+        with self.get_connection(readonly=True) as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT s.*, i.room_name as lab_name, i.capacity as lab_capacity
@@ -658,80 +1375,84 @@ class Database:
     
     def create_subject_allocation(self, data):
         """Allocate subject to batch with faculty"""
+        return self.create_subject_allocations_bulk([data])[0]
+    
+    def create_subject_allocations_bulk(self, rows):
+        """Create many subject allocations in a single transaction; returns the new ids in order"""
+        params = [(
+            data['subject_id'],
+            data['batch_id'],
+            data['faculty_id'],
+            data.get('semester'),
+            data.get('academic_year')
+        ) for data in rows]
+        if not params:
+            return []
+        
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
+            conn.executemany('''
                 INSERT INTO subject_allocation 
                 (subject_id, batch_id, faculty_id, semester, academic_year)
                 VALUES (?, ?, ?, ?, ?)
-            ''', (
-                data['subject_id'],
-                data['batch_id'],
-                data['faculty_id'],
-                data.get('semester'),
-                data.get('academic_year')
-            ))
-            return cursor.lastrowid
+            ''', params)
+            # AUTOINCREMENT ids are contiguous while we hold the writer connection
+            last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+            return list(range(last_id - len(params) + 1, last_id + 1))
     
     def get_allocations_by_batch(self, batch_id, semester=None):
         """Get all subject allocations for a batch"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            query = '''
-                SELECT sa.*, 
-                       s.subject_name, s.subject_code, s.total_hours_per_week, 
-                       s.theory_hours, s.lab_hours, s.requires_lab,
-                       f.faculty_name, f.faculty_code,
-                       b.batch_name
-                FROM subject_allocation sa
-                JOIN subjects s ON sa.subject_id = s.id
-                JOIN faculty f ON sa.faculty_id = f.id
-                JOIN batches b ON sa.batch_id = b.id
-                WHERE sa.batch_id = ?
-            '''
+        with self.get_connection(readonly=True) as conn:
+            cursor = _plain_cursor(conn)
             
-            params = [batch_id]
-            if semester:
-                query += ' AND sa.semester = ?'
-                params.append(semester)
-            
-            cursor.execute(query, params)
-            return [dict(row) for row in cursor.fetchall()]
+            cursor.execute(SQL_GET_ALLOCATIONS_BY_BATCH, {
+                'batch_id': batch_id,
+                'semester': semester or None
+            })
+            return _fetch_dicts(cursor)
+    
+    def get_allocations_with_room(self, batch_ids, semester=None):
+        """Get allocations for several batches with subject and preferred lab details"""
+        with self.get_connection(readonly=True) as conn:
+            cursor = _plain_cursor(conn)
+            cursor.execute(SQL_GET_ALLOCATIONS_WITH_ROOM, {
+                'batch_ids': _dump_json(list(batch_ids)),
+                'semester': semester or None
+            })
+            return _fetch_dicts(cursor)
     
     def get_allocations_by_faculty(self, faculty_id, semester=None):
         """Get all allocations for a faculty"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            query = '''
-                SELECT sa.*, 
-                       s.subject_name, s.subject_code, s.total_hours_per_week,
-                       b.batch_name, b.num_students
-                FROM subject_allocation sa
-                JOIN subjects s ON sa.subject_id = s.id
-                JOIN batches b ON sa.batch_id = b.id
-                WHERE sa.faculty_id = ?
-            '''
+        with self.get_connection(readonly=True) as conn:
+            cursor = _plain_cursor(conn)
             
-            params = [faculty_id]
-            if semester:
-                query += ' AND sa.semester = ?'
-                params.append(semester)
-            
-            cursor.execute(query, params)
-            return [dict(row) for row in cursor.fetchall()]
+            cursor.execute(SQL_GET_ALLOCATIONS_BY_FACULTY, {
+                'faculty_id': faculty_id,
+                'semester': semester or None
+            })
+            return _fetch_dicts(cursor)
     
-    def calculate_faculty_workload(self, faculty_id, semester=None):
+    def calculate_faculty_workload(self, faculty_id, semester=None, include_allocations=True):
         """Calculate total teaching hours for faculty"""
-        allocations = self.get_allocations_by_faculty(faculty_id, semester)
-        total_hours = sum(alloc['total_hours_per_week'] for alloc in allocations)
-        return {
-            'faculty_id': faculty_id,
-            'total_hours': total_hours,
-            'num_subjects': len(allocations),
-            'allocations': allocations
-        }
+        if include_allocations:
+            allocations = self.get_allocations_by_faculty(faculty_id, semester)
+            return {
+                'faculty_id': faculty_id,
+                'total_hours': sum(alloc['total_hours_per_week'] for alloc in allocations),
+                'num_subjects': len(allocations),
+                'allocations': allocations
+            }
+        
+        # Totals only: let SQLite aggregate instead of shipping the joined rows
+        with self.get_connection(readonly=True) as conn:
+            total_hours, num_subjects = conn.execute(SQL_SUM_FACULTY_HOURS, {
+                'faculty_id': faculty_id,
+                'semester': semester or None
+            }).fetchone()
+            return {
+                'faculty_id': faculty_id,
+                'total_hours': total_hours,
+                'num_subjects': num_subjects
+            }
     
     # ==================== HOLIDAY OPERATIONS ====================
     
@@ -747,25 +1468,23 @@ class Database:
     
     def get_all_holidays(self, year=None, month=None):
         """Get holidays"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+        with self.get_connection(readonly=True) as conn:
+            cursor = _plain_cursor(conn)
             
+            # Compare against ISO date bounds rather than strftime() so the
+            # holiday_date index can be used
             if year and month:
-                cursor.execute('''
-                    SELECT * FROM holidays 
-                    WHERE strftime('%Y', holiday_date) = ? AND strftime('%m', holiday_date) = ?
-                    ORDER BY holiday_date
-                ''', (str(year), f'{month:02d}'))
+                year, month = int(year), int(month)
+                next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+                cursor.execute(SQL_GET_HOLIDAYS_BETWEEN,
+                               (f'{year:04d}-{month:02d}-01', f'{next_year:04d}-{next_month:02d}-01'))
             elif year:
-                cursor.execute('''
-                    SELECT * FROM holidays 
-                    WHERE strftime('%Y', holiday_date) = ?
-                    ORDER BY holiday_date
-                ''', (str(year),))
+                year = int(year)
+                cursor.execute(SQL_GET_HOLIDAYS_BETWEEN, (f'{year:04d}-01-01', f'{year + 1:04d}-01-01'))
             else:
                 cursor.execute('SELECT * FROM holidays ORDER BY holiday_date')
             
-            return [dict(row) for row in cursor.fetchall()]
+            return _fetch_dicts(cursor)
     
     def delete_holiday(self, holiday_id):
         """Delete holiday"""
@@ -774,12 +1493,15 @@ class Database:
             cursor.execute('DELETE FROM holidays WHERE id = ?', (holiday_id,))
             return cursor.rowcount
     
+    @_cached_by_version('holidays', copier=None)
+    def get_holiday_dates(self):
+        """Get the set of all holiday dates"""
+        with self.get_connection(readonly=True) as conn:
+            return frozenset(row[0] for row in conn.execute('SELECT holiday_date FROM holidays'))
+    
     def is_holiday(self, date):
         """Check if date is a holiday"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM holidays WHERE holiday_date = ?', (date,))
-            return cursor.fetchone() is not None
+        return _date_key(date) in self.get_holiday_dates()
     
     # ==================== FACULTY LEAVE OPERATIONS ====================
     
@@ -802,8 +1524,8 @@ class Database:
     
     def get_faculty_leaves(self, faculty_id=None, date=None):
         """Get faculty leaves"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+        with self.get_connection(readonly=True) as conn:
+            cursor = _plain_cursor(conn)
             
             if faculty_id and date:
                 cursor.execute('''
@@ -835,12 +1557,17 @@ class Database:
                     ORDER BY fl.leave_date DESC
                 ''')
             
-            return [dict(row) for row in cursor.fetchall()]
+            return _fetch_dicts(cursor)
+    
+    @_cached_by_version('faculty_leaves', copier=None)
+    def get_faculty_leave_keys(self):
+        """Get the set of all (faculty_id, leave_date) pairs"""
+        with self.get_connection(readonly=True) as conn:
+            return frozenset(_plain_cursor(conn).execute('SELECT faculty_id, leave_date FROM faculty_leaves'))
     
     def is_faculty_on_leave(self, faculty_id, date):
         """Check if faculty is on leave"""
-        leaves = self.get_faculty_leaves(faculty_id, date)
-        return len(leaves) > 0
+        return (int(faculty_id), _date_key(date)) in self.get_faculty_leave_keys()
     
     # ==================== EVENT OPERATIONS ====================
     
@@ -859,74 +1586,69 @@ class Database:
                 data['start_time'],
                 data['end_time'],
                 data.get('event_type'),
-                json.dumps(data.get('affected_batches', [])),
-                json.dumps(data.get('affected_faculty', [])),
-                json.dumps(data.get('rooms_blocked', [])),
+                _dump_json(data.get('affected_batches', [])),
+                _dump_json(data.get('affected_faculty', [])),
+                _dump_json(data.get('rooms_blocked', [])),
                 data.get('description')
             ))
             return cursor.lastrowid
     
     def get_events(self, date=None):
         """Get events"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+        with self.get_connection(readonly=True) as conn:
+            cursor = _plain_cursor(conn)
             
             if date:
                 cursor.execute('SELECT * FROM events WHERE event_date = ?', (date,))
             else:
                 cursor.execute('SELECT * FROM events ORDER BY event_date DESC')
             
-            results = []
-            for row in cursor.fetchall():
-                data = dict(row)
-                data = self._parse_json_field(data, 'affected_batches')
-                data = self._parse_json_field(data, 'affected_faculty')
-                data = self._parse_json_field(data, 'rooms_blocked')
-                results.append(data)
-            return results
+            return [{**row,
+                     'affected_batches': _load_json_column(row['affected_batches'], []),
+                     'affected_faculty': _load_json_column(row['affected_faculty'], []),
+                     'rooms_blocked': _load_json_column(row['rooms_blocked'], [])}
+                    for row in _fetch_dicts(cursor)]
     
     # ==================== TIMETABLE SESSION OPERATIONS ====================
     
     def create_timetable_session(self, data):
         """Create timetable session"""
+        return self.create_timetable_sessions_bulk([data])[0]
+    
+    def create_timetable_sessions_bulk(self, rows):
+        """Create many timetable sessions in a single transaction; returns the new ids in order"""
+        params = [(
+            data.get('schedule_id'),
+            data['subject_id'],
+            data['batch_id'],
+            data['faculty_id'],
+            data['room_id'],
+            data['day_of_week'],
+            data['time_slot'],
+            data.get('duration', 1),
+            data['session_type']
+        ) for data in rows]
+        if not params:
+            return []
+        
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO timetable_sessions 
-                (schedule_id, subject_id, batch_id, faculty_id, room_id,
-                 day_of_week, time_slot, duration, session_type)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                data.get('schedule_id'),
-                data['subject_id'],
-                data['batch_id'],
-                data['faculty_id'],
-                data['room_id'],
-                data['day_of_week'],
-                data['time_slot'],
-                data.get('duration', 1),
-                data['session_type']
-            ))
-            return cursor.lastrowid
-    
+            conn.executemany(SQL_INSERT_TIMETABLE_SESSION, params)
+            # AUTOINCREMENT ids are contiguous while we hold the writer connection
+            last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+            # Read the last id first: the version upsert moves last_insert_rowid
+            conn.execute(SQL_BUMP_CACHE_VERSION, ('table:timetable_sessions',))
+            return list(range(last_id - len(params) + 1, last_id + 1))
+    
+    # Rebuilding the joined rows is the bulk of a timetable view; keep them until
+    # the sessions or any of the tables they take names from change
+    @_cached_by_version('timetable_sessions', 'subjects', 'batches', 'faculty', 'infrastructure',
+                        copier=_copy_rows)
     def get_timetable_sessions(self, schedule_id=None, batch_id=None, faculty_id=None):
         """Get timetable sessions"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+        with self.get_connection(readonly=True) as conn:
+            cursor = _plain_cursor(conn)
             
-            query = '''
-                SELECT ts.*,
-                       s.subject_name, s.subject_code,
-                       b.batch_name,
-                       f.faculty_name,
-                       i.room_name, i.room_code
-                FROM timetable_sessions ts
-                JOIN subjects s ON ts.subject_id = s.id
-                JOIN batches b ON ts.batch_id = b.id
-                JOIN faculty f ON ts.faculty_id = f.id
-                JOIN infrastructure i ON ts.room_id = i.id
-                WHERE 1=1
-            '''
+            query = SQL_GET_TIMETABLE_SESSIONS
             
             params = []
             if schedule_id:
@@ -942,77 +1664,32 @@ class Database:
             query += ' ORDER BY ts.day_of_week, ts.time_slot'
             
             cursor.execute(query, params)
-            return [dict(row) for row in cursor.fetchall()]
+            return _fetch_dicts(cursor)
     
     def delete_timetable_sessions_by_schedule(self, schedule_id):
         """Delete all sessions for a schedule"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('DELETE FROM timetable_sessions WHERE schedule_id = ?', (schedule_id,))
-            return cursor.rowcount
+            deleted = cursor.rowcount
+            cursor.execute(SQL_BUMP_CACHE_VERSION, ('table:timetable_sessions',))
+            return deleted
     
     def check_session_conflicts(self, session_data):
         """Check for scheduling conflicts"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            conflicts = []
-            
-            # Check faculty conflict
-            cursor.execute('''
-                SELECT * FROM timetable_sessions
-                WHERE faculty_id = ? AND day_of_week = ? AND time_slot = ?
-                AND id != ?
-            ''', (
-                session_data['faculty_id'],
-                session_data['day_of_week'],
-                session_data['time_slot'],
-                session_data.get('id', 0)
-            ))
-            
-            if cursor.fetchone():
-                conflicts.append({
-                    'type': 'faculty_conflict',
-                    'message': 'Faculty already has a class at this time'
-                })
+        with self.get_connection(readonly=True) as conn:
+            row = conn.execute(SQL_CHECK_SESSION_CONFLICTS, {
+                'faculty_id': session_data['faculty_id'],
+                'room_id': session_data['room_id'],
+                'batch_id': session_data['batch_id'],
+                'day_of_week': session_data['day_of_week'],
+                'time_slot': session_data['time_slot'],
+                'id': session_data.get('id', 0)
+            }).fetchone()
             
-            # Check room conflict
-            cursor.execute('''
-                SELECT * FROM timetable_sessions
-                WHERE room_id = ? AND day_of_week = ? AND time_slot = ?
-                AND id != ?
-            ''', (
-                session_data['room_id'],
-                session_data['day_of_week'],
-                session_data['time_slot'],
-                session_data.get('id', 0)
-            ))
-            
-            if cursor.fetchone():
-                conflicts.append({
-                    'type': 'room_conflict',
-                    'message': 'Room already occupied at this time'
-                })
-            
-            # Check batch conflict
-            cursor.execute('''
-                SELECT * FROM timetable_sessions
-                WHERE batch_id = ? AND day_of_week = ? AND time_slot = ?
-                AND id != ?
-            ''', (
-                session_data['batch_id'],
-                session_data['day_of_week'],
-                session_data['time_slot'],
-                session_data.get('id', 0)
-            ))
-            
-            if cursor.fetchone():
-                conflicts.append({
-                    'type': 'batch_conflict',
-                    'message': 'Batch already has a class at this time'
-                })
-            
-            return conflicts
+            return [{'type': conflict_type, 'message': message}
+                    for conflict_type, _, message in SESSION_CONFLICTS
+                    if row[conflict_type]]
     
     # ==================== SCHEDULE OPERATIONS ====================
     
@@ -1020,49 +1697,78 @@ class Database:
         """Create new schedule container with semester info"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            
-            # Store additional semester info in description or new fields
-            metadata = {
-                'num_weeks': num_weeks,
-                'start_date': str(start_date) if start_date else None,
-                'end_date': str(end_date) if end_date else None,
-                'recurring_weekly': True
-            }
-            
-            description_with_meta = f"{description}\n[META]{json.dumps(metadata)}[/META]"
-            
             cursor.execute('''
-                INSERT INTO schedules (title, description, owner_id, semester, academic_year)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (title, description_with_meta, owner_id, semester, academic_year))
+                INSERT INTO schedules
+                (title, description, owner_id, semester, academic_year, num_weeks, start_date, end_date)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                title, description, owner_id, semester, academic_year, num_weeks,
+                str(start_date) if start_date else None,
+                str(end_date) if end_date else None
+            ))
             return cursor.lastrowid
     
     def get_user_schedules(self, user_id):
         """Get all schedules for user"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+        with self.get_connection(readonly=True) as conn:
+            cursor = _plain_cursor(conn)
             
-            # Owned schedules
+            # Owned schedules first, then shared ones, each newest first
+            cursor.execute('''
+                SELECT * FROM (
+                    SELECT * FROM schedules WHERE owner_id = :user_id
+                    UNION ALL
+                    SELECT s.* FROM schedules s
+                    JOIN share_permissions sp ON s.id = sp.schedule_id
+                    WHERE sp.user_id = :user_id
+                )
+                ORDER BY owner_id != :user_id, updated_at DESC
+            ''', {'user_id': user_id})
+            return _fetch_dicts(cursor)
+    
+    def get_recent_schedules_summary(self, owner_id, limit=5):
+        """Get most recently updated schedules owned by user, with entity/constraint counts"""
+        with self.get_connection(readonly=True) as conn:
+            cursor = _plain_cursor(conn)
+            # Count JSON arrays inside SQLite instead of shipping the blobs
             cursor.execute('''
-                SELECT * FROM schedules WHERE owner_id = ?
+                SELECT id, title, status, description, created_at, updated_at,
+                       CASE WHEN json_valid(entities) THEN json_array_length(entities) ELSE 0 END AS n_entities,
+                       CASE WHEN json_valid(constraints) THEN json_array_length(constraints) ELSE 0 END AS n_constraints
+                FROM schedules WHERE owner_id = ?
                 ORDER BY updated_at DESC
-            ''', (user_id,))
-            owned = [dict(row) for row in cursor.fetchall()]
+                LIMIT ?
+            ''', (owner_id, limit))
+            return _fetch_dicts(cursor)
+    
+    def get_user_schedule_counts(self, user_id):
+        """Get schedule counts by status for user (owned + shared)"""
+        with self.get_connection(readonly=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute(SQL_COUNT_STATUSES, (user_id, user_id))
             
-            # Shared schedules
+            counts = {'total': 0, 'draft': 0, 'finalized': 0, 'shared': 0}
+            for row in cursor.fetchall():
+                counts['total'] += row['count']
+                counts['shared'] += row['shared']
+                if row['status'] in counts:
+                    counts[row['status']] += row['count']
+            return counts
+    
+    def get_schedule_activity(self, days=30):
+        """Get schedules created per day over the last N days"""
+        with self.get_connection(readonly=True) as conn:
+            cursor = _plain_cursor(conn)
             cursor.execute('''
-                SELECT s.* FROM schedules s
-                JOIN share_permissions sp ON s.id = sp.schedule_id
-                WHERE sp.user_id = ?
-                ORDER BY s.updated_at DESC
-            ''', (user_id,))
-            shared = [dict(row) for row in cursor.fetchall()]
-            
-            return owned + shared
+                SELECT date, count FROM schedule_daily_counts
+                WHERE date >= DATE('now', ?) AND count > 0
+                ORDER BY date DESC
+            ''', (f'-{days} days',))
+            return _fetch_dicts(cursor)
     
     def get_schedule(self, schedule_id):
         """Get schedule by ID"""
-        with self.get_connection() as conn:
+        with self.get_connection(readonly=True) as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM schedules WHERE id = ?', (schedule_id,))
             row = cursor.fetchone()
@@ -1073,38 +1779,45 @@ class Database:
                 return data
             return None
     
+    def get_schedule_with_sessions(self, schedule_id):
+        """Get schedule and its timetable sessions from one read snapshot"""
+        with self.get_connection(readonly=True) as conn:
+            # Both getters reuse this thread's reader, so the explicit read
+            # transaction keeps a concurrent optimizer save from landing between them
+            conn.execute('BEGIN')
+            try:
+                schedule = self.get_schedule(schedule_id)
+                sessions = self.get_timetable_sessions(schedule_id=schedule_id) if schedule else []
+            finally:
+                conn.execute('COMMIT')
+            return {'schedule': schedule, 'sessions': sessions}
+    
     def update_schedule(self, schedule_id, updates):
         """Update schedule"""
-        updates['updated_at'] = datetime.now().isoformat()
+        updates = dict(updates)
+        updates.pop('updated_at', None)
         
         # Convert dicts/lists to JSON
         for key in ['optimization_config', 'optimization_history']:
             if key in updates and isinstance(updates[key], (dict, list)):
-                updates[key] = json.dumps(updates[key])
+                updates[key] = _dump_json(updates[key])
         
-        set_clause = ', '.join([f"{key} = ?" for key in updates.keys()])
-        values = list(updates.values()) + [schedule_id]
+        columns = tuple(sorted(updates))
+        values = [updates[key] for key in columns] + [datetime.now().isoformat(), schedule_id]
         
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(f'UPDATE schedules SET {set_clause} WHERE id = ?', values)
+            cursor.execute(_update_schedule_sql(columns), values)
             return cursor.rowcount
     
     def delete_schedule(self, schedule_id):
         """Delete schedule and all sessions"""
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Delete sessions first
-            cursor.execute('DELETE FROM timetable_sessions WHERE schedule_id = ?', (schedule_id,))
-            
-            # Delete shares
-            cursor.execute('DELETE FROM share_permissions WHERE schedule_id = ?', (schedule_id,))
-            
-            # Delete schedule
-            cursor.execute('DELETE FROM schedules WHERE id = ?', (schedule_id,))
-            
-            return cursor.rowcount
+            conn.execute('BEGIN IMMEDIATE')
+            # Sessions go with it via trigger, shares and versions via foreign key cascade
+            deleted = conn.execute('DELETE FROM schedules WHERE id = ?', (schedule_id,)).rowcount
+            conn.execute(SQL_INCREMENTAL_VACUUM)
+            return deleted
     
     # ==================== SHARING OPERATIONS ====================
     
@@ -1113,14 +1826,16 @@ class Database:
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                INSERT OR REPLACE INTO share_permissions (schedule_id, user_id, permission)
+                INSERT INTO share_permissions (schedule_id, user_id, permission)
                 VALUES (?, ?, ?)
+                ON CONFLICT(schedule_id, user_id) DO UPDATE SET permission = excluded.permission
+                RETURNING id
             ''', (schedule_id, user_id, permission))
-            return cursor.lastrowid
+            return cursor.fetchone()[0]
     
     def get_schedule_permissions(self, schedule_id, user_id):
         """Get user permission for schedule"""
-        with self.get_connection() as conn:
+        with self.get_connection(readonly=True) as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT permission FROM share_permissions
@@ -1131,15 +1846,28 @@ class Database:
     
     def get_schedule_collaborators(self, schedule_id):
         """Get all collaborators for schedule"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+        with self.get_connection(readonly=True) as conn:
+            cursor = _plain_cursor(conn)
             cursor.execute('''
                 SELECT u.id, u.username, u.email, sp.permission, sp.shared_at
                 FROM users u
                 JOIN share_permissions sp ON u.id = sp.user_id
                 WHERE sp.schedule_id = ?
             ''', (schedule_id,))
-            return [dict(row) for row in cursor.fetchall()]
+            return _fetch_dicts(cursor)
+    
+    def get_collaborators_by_schedule(self, schedule_ids):
+        """Get collaborators for many schedules in one query, keyed by schedule id"""
+        collaborators = {schedule_id: [] for schedule_id in schedule_ids}
+        if not collaborators:
+            return collaborators
+        
+        with self.get_connection(readonly=True) as conn:
+            cursor = _plain_cursor(conn)
+            cursor.execute(SQL_GET_COLLABORATORS_BY_SCHEDULE, {'schedule_ids': _dump_json(list(collaborators))})
+            for row in _fetch_dicts(cursor):
+                collaborators[row.pop('schedule_id')].append(row)
+            return collaborators
 
 
 
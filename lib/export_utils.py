@@ -1,45 +1,124 @@
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
 import pandas as pd
-import plotly.graph_objects as go
 from datetime import datetime
+from collections import Counter
+from functools import lru_cache
+import gzip
 import io
-import json
+import orjson
 
-class ScheduleExporter:
-    """Export schedules to various formats"""
+# ReportLab and openpyxl add ~125 ms to import, so they are only loaded
+# when a PDF or Excel export actually runs (zstandard likewise for zstd JSON)
+
+# Slots per schedule table in the PDF; keeps each table's layout cost bounded
+PDF_TABLE_CHUNK_ROWS = 50
+# Rows inspected when sizing Excel columns; a full scan costs as much as the write
+EXCEL_WIDTH_SAMPLE_ROWS = 50
+# export_to_json compress option -> (file suffix, MIME type) for downloads
+JSON_EXPORT_FORMATS = {
+    None: ('.json', 'application/json'),
+    'gzip': ('.json.gz', 'application/gzip'),
+    'zstd': ('.json.zst', 'application/zstd'),
+}
+
+
+@lru_cache(maxsize=None)
+def _pdf_styles():
+    """Build the ReportLab styles shared by every PDF export"""
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    from reportlab.platypus import TableStyle
     
-    @staticmethod
-    def export_to_pdf(schedule, metadata, include_stats=True):
-        """Export schedule to PDF with formatting"""
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter, 
-                               topMargin=0.5*inch, bottomMargin=0.5*inch)
-        elements = []
-        styles = getSampleStyleSheet()
+    styles = getSampleStyleSheet()
+    return {
+        'sheet': styles,
         
         # Custom styles
-        title_style = ParagraphStyle(
+        'title': ParagraphStyle(
             'CustomTitle',
             parent=styles['Heading1'],
             fontSize=24,
             textColor=colors.HexColor('#3B82F6'),
             spaceAfter=30,
             alignment=TA_CENTER
-        )
+        ),
         
-        heading_style = ParagraphStyle(
+        'heading': ParagraphStyle(
             'CustomHeading',
             parent=styles['Heading2'],
             fontSize=14,
             textColor=colors.HexColor('#1F2937'),
             spaceAfter=12,
             spaceBefore=12
-        )
+        ),
+        
+        'schedule_table': TableStyle([
+            # Header styling
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3B82F6')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 11),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('TOPPADDING', (0, 0), (-1, 0), 12),
+            
+            # Body styling
+            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F3F4F6')]),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]),
+        
+        'stats_table': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3B82F6')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F3F4F6')]),
+        ]),
+        
+        'constraint_table': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3B82F6')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F3F4F6')]),
+        ]),
+        
+        # Entity, Day, Time, Room, Duration; fills the 6.5" text width of a letter page
+        'schedule_col_widths': [2.2*inch, 0.9*inch, 0.7*inch, 1.5*inch, 1.2*inch],
+    }
+
+
+@lru_cache(maxsize=None)
+def _excel_header_font():
+    """Bold font shared by every Excel header row"""
+    from openpyxl.styles import Font
+    return Font(bold=True)
+
+class ScheduleExporter:
+    """Export schedules to various formats"""
+    
+    @staticmethod
+    def export_to_pdf(schedule, metadata, include_stats=True, stats=None):
+        """Export schedule to PDF with formatting; pass stats to reuse precomputed statistics"""
+        from reportlab.lib.pagesizes import letter
+        from reportlab.lib.units import inch
+        from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer, PageBreak
+        
+        pdf_styles = _pdf_styles()
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=letter, 
+                               topMargin=0.5*inch, bottomMargin=0.5*inch)
+        elements = []
+        styles = pdf_styles['sheet']
+        title_style = pdf_styles['title']
+        heading_style = pdf_styles['heading']
         
         # Title
         title = Paragraph(f"<b>{metadata.get('title', 'Schedule')}</b>", title_style)
@@ -62,39 +141,24 @@ class ScheduleExporter:
         elements.append(Paragraph("<b>Schedule Timetable</b>", heading_style))
         
         # Prepare table data
-        table_data = [['Entity', 'Day', 'Time', 'Room', 'Duration (hrs)']]
+        header = ['Entity', 'Day', 'Time', 'Room', 'Duration (hrs)']
+        rows = [[
+            str(slot.get('entity_name', slot.get('entity_id', 'N/A')))[:30],
+            str(slot.get('day', 'N/A')),
+            str(slot.get('time', 'N/A')),
+            str(slot.get('room', 'N/A')),
+            str(slot.get('duration', 'N/A'))
+        ] for slot in schedule]
         
-        for slot in schedule:
-            table_data.append([
-                str(slot.get('entity_name', slot.get('entity_id', 'N/A')))[:30],
-                str(slot.get('day', 'N/A')),
-                str(slot.get('time', 'N/A')),
-                str(slot.get('room', 'N/A')),
-                str(slot.get('duration', 'N/A'))
-            ])
-        
-        # Create table with styling
-        table = Table(table_data, repeatRows=1)
-        table.setStyle(TableStyle([
-            # Header styling
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3B82F6')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('TOPPADDING', (0, 0), (-1, 0), 12),
-            
-            # Body styling
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F3F4F6')]),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
+        # ReportLab re-lays out the rest of a table on every page split, which
+        # is quadratic in its length, so emit fixed-size tables with fixed
+        # column widths that line up with each other
+        for start in range(0, max(len(rows), 1), PDF_TABLE_CHUNK_ROWS):
+            table = Table([header] + rows[start:start + PDF_TABLE_CHUNK_ROWS],
+                          colWidths=pdf_styles['schedule_col_widths'], repeatRows=1)
+            table.setStyle(pdf_styles['schedule_table'])
+            elements.append(table)
         
-        elements.append(table)
         elements.append(Spacer(1, 0.3*inch))
         
         # Statistics section
@@ -103,7 +167,7 @@ class ScheduleExporter:
             elements.append(Paragraph("<b>Schedule Statistics</b>", heading_style))
             
             # Calculate statistics
-            stats = ScheduleExporter._calculate_statistics(schedule)
+            stats = stats or ScheduleExporter.calculate_statistics(schedule)
             
             # Day distribution
             day_data = [['Day', 'Number of Sessions']]
@@ -111,14 +175,7 @@ class ScheduleExporter:
                 day_data.append([day, str(count)])
             
             day_table = Table(day_data)
-            day_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3B82F6')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F3F4F6')]),
-            ]))
+            day_table.setStyle(pdf_styles['stats_table'])
             
             elements.append(Paragraph("<b>Distribution by Day:</b>", styles['Normal']))
             elements.append(Spacer(1, 0.1*inch))
@@ -131,14 +188,7 @@ class ScheduleExporter:
                 room_data.append([room, str(count)])
             
             room_table = Table(room_data)
-            room_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3B82F6')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F3F4F6')]),
-            ]))
+            room_table.setStyle(pdf_styles['stats_table'])
             
             elements.append(Paragraph("<b>Room Utilization:</b>", styles['Normal']))
             elements.append(Spacer(1, 0.1*inch))
@@ -158,14 +208,7 @@ class ScheduleExporter:
                 ])
             
             constraint_table = Table(constraint_data, repeatRows=1)
-            constraint_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3B82F6')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F3F4F6')]),
-            ]))
+            constraint_table.setStyle(pdf_styles['constraint_table'])
             
             elements.append(constraint_table)
         
@@ -180,67 +223,89 @@ class ScheduleExporter:
         return buffer
     
     @staticmethod
-    def export_to_excel(schedule, metadata):
-        """Export schedule to Excel with multiple sheets"""
+    def export_to_excel(schedule, metadata, stats=None):
+        """Export schedule to Excel with multiple sheets; pass stats to reuse precomputed statistics"""
+        from openpyxl import Workbook
+        
         buffer = io.BytesIO()
         
-        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-            # Main schedule sheet
-            if schedule:
-                df = pd.DataFrame(schedule)
-                # Reorder columns for better readability
-                column_order = ['entity_name', 'day', 'time', 'room', 'duration']
-                existing_cols = [col for col in column_order if col in df.columns]
-                other_cols = [col for col in df.columns if col not in column_order]
-                df = df[existing_cols + other_cols]
-                
-                df.to_excel(writer, sheet_name='Schedule', index=False)
-                
-                # Auto-adjust column widths
-                worksheet = writer.sheets['Schedule']
-                for idx, col in enumerate(df.columns):
-                    max_length = max(
-                        df[col].astype(str).apply(len).max(),
-                        len(str(col))
-                    )
-                    worksheet.column_dimensions[chr(65 + idx)].width = min(max_length + 2, 50)
+        # Write-only workbooks stream rows out instead of building every cell in memory
+        wb = Workbook(write_only=True)
+        
+        # Main schedule sheet
+        if schedule:
+            # Reorder columns for better readability
+            column_order = ['entity_name', 'day', 'time', 'room', 'duration']
+            all_cols = list(dict.fromkeys(col for slot in schedule for col in slot))
+            existing_cols = [col for col in column_order if col in all_cols]
+            other_cols = [col for col in all_cols if col not in column_order]
+            columns = existing_cols + other_cols
+            rows = [tuple(slot.get(col) for col in columns) for slot in schedule]
+            
+            # Auto-adjust column widths from a sample of rows
+            widths = [len(str(col)) for col in columns]
+            for row in rows[:EXCEL_WIDTH_SAMPLE_ROWS]:
+                widths = [max(width, len(str(value))) for width, value in zip(widths, row)]
+            
+            ScheduleExporter._write_sheet(wb, 'Schedule', columns, rows,
+                                          widths=[min(width + 2, 50) for width in widths])
+        
+        # Metadata sheet
+        ScheduleExporter._write_sheet(wb, 'Metadata', [
+            'Title', 'Status', 'Method', 'Total Slots', 'Fitness Score', 'Generated'
+        ], [(
+            metadata.get('title', 'N/A'),
+            metadata.get('status', 'N/A'),
+            metadata.get('method', 'N/A'),
+            len(schedule),
+            metadata.get('fitness', 'N/A'),
+            datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        )])
+        
+        # Statistics sheet
+        if schedule:
+            stats = stats or ScheduleExporter.calculate_statistics(schedule)
+            
+            # Day distribution
+            ScheduleExporter._write_sheet(wb, 'Day Distribution', ['Day', 'Count'],
+                                          stats['day_distribution'].items())
             
-            # Metadata sheet
-            meta_df = pd.DataFrame([{
-                'Title': metadata.get('title', 'N/A'),
-                'Status': metadata.get('status', 'N/A'),
-                'Method': metadata.get('method', 'N/A'),
-                'Total Slots': len(schedule),
-                'Fitness Score': metadata.get('fitness', 'N/A'),
-                'Generated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }])
-            meta_df.to_excel(writer, sheet_name='Metadata', index=False)
+            # Room usage
+            ScheduleExporter._write_sheet(wb, 'Room Usage', ['Room', 'Count'],
+                                          stats['room_usage'].items())
             
-            # Statistics sheet
-            if schedule:
-                stats = ScheduleExporter._calculate_statistics(schedule)
-                
-                # Day distribution
-                day_df = pd.DataFrame(list(stats['day_distribution'].items()), 
-                                     columns=['Day', 'Count'])
-                day_df.to_excel(writer, sheet_name='Day Distribution', index=False)
-                
-                # Room usage
-                room_df = pd.DataFrame(list(stats['room_usage'].items()), 
-                                      columns=['Room', 'Count'])
-                room_df.to_excel(writer, sheet_name='Room Usage', index=False)
-                
-                # Time slot distribution
-                time_df = pd.DataFrame(list(stats['time_distribution'].items()), 
-                                      columns=['Time', 'Count'])
-                time_df.to_excel(writer, sheet_name='Time Distribution', index=False)
+            # Time slot distribution
+            ScheduleExporter._write_sheet(wb, 'Time Distribution', ['Time', 'Count'],
+                                          stats['time_distribution'].items())
         
+        wb.save(buffer)
         buffer.seek(0)
         return buffer
     
     @staticmethod
-    def export_to_json(schedule, metadata):
-        """Export schedule to JSON with metadata"""
+    def _write_sheet(wb, title, headers, rows, widths=None):
+        """Append a sheet with a bold header row to a write-only workbook"""
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.utils import get_column_letter
+        
+        ws = wb.create_sheet(title=title)
+        # Column widths must be set before the first row is written
+        for idx, width in enumerate(widths or [], start=1):
+            ws.column_dimensions[get_column_letter(idx)].width = width
+        
+        header = []
+        for name in headers:
+            cell = WriteOnlyCell(ws, value=name)
+            cell.font = _excel_header_font()
+            header.append(cell)
+        ws.append(header)
+        
+        for row in rows:
+            ws.append(row)
+    
+    @staticmethod
+    def export_to_json(schedule, metadata, stats=None, compress=None):
+        """Export schedule to JSON with metadata; compress='gzip' or 'zstd' returns compressed bytes"""
         data = {
             "metadata": {
                 "title": metadata.get('title', 'Schedule'),
@@ -252,7 +317,7 @@ class ScheduleExporter:
                 "version": "1.0"
             },
             "schedule": schedule,
-            "statistics": ScheduleExporter._calculate_statistics(schedule) if schedule else {}
+            "statistics": (stats or ScheduleExporter.calculate_statistics(schedule)) if schedule else {}
         }
         
         # Add config if available
@@ -263,7 +328,20 @@ class ScheduleExporter:
         if metadata.get('history'):
             data['optimization_history'] = metadata['history']
         
-        return json.dumps(data, indent=2, default=str)
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if compress is None:
+            return orjson.dumps(data, option=option | orjson.OPT_INDENT_2, default=str).decode()
+        
+        raw = orjson.dumps(data, option=option, default=str)
+        if compress == 'gzip':
+            return gzip.compress(raw)
+        if compress == 'zstd':
+            try:
+                import zstandard
+            except ImportError:
+                raise ImportError("compress='zstd' needs the zstandard package (see requirements.txt)") from None
+            return zstandard.ZstdCompressor(level=3).compress(raw)
+        raise ValueError(f"Unknown compression: {compress}")
     
     @staticmethod
     def export_chart_as_image(fig, width=1200, height=800):
@@ -275,40 +353,21 @@ class ScheduleExporter:
             return None
     
     @staticmethod
-    def _calculate_statistics(schedule):
+    def calculate_statistics(schedule):
         """Calculate statistics from schedule"""
-        stats = {
-            'day_distribution': {},
-            'room_usage': {},
-            'time_distribution': {},
+        day_counts = Counter([slot.get('day', 'Unknown') for slot in schedule])
+        room_counts = Counter([slot.get('room', 'Unknown') for slot in schedule])
+        time_counts = Counter([slot.get('time', 'Unknown') for slot in schedule])
+        
+        return {
+            'day_distribution': dict(day_counts),
+            'room_usage': dict(room_counts),
+            'time_distribution': dict(time_counts),
             'total_slots': len(schedule),
-            'unique_days': set(),
-            'unique_rooms': set(),
-            'unique_times': set()
+            'unique_days': len(day_counts),
+            'unique_rooms': len(room_counts),
+            'unique_times': len(time_counts)
         }
-        
-        for slot in schedule:
-            # Day distribution
-            day = slot.get('day', 'Unknown')
-            stats['day_distribution'][day] = stats['day_distribution'].get(day, 0) + 1
-            stats['unique_days'].add(day)
-            
-            # Room usage
-            room = slot.get('room', 'Unknown')
-            stats['room_usage'][room] = stats['room_usage'].get(room, 0) + 1
-            stats['unique_rooms'].add(room)
-            
-            # Time distribution
-            time = slot.get('time', 'Unknown')
-            stats['time_distribution'][time] = stats['time_distribution'].get(time, 0) + 1
-            stats['unique_times'].add(time)
-        
-        # Convert sets to counts
-        stats['unique_days'] = len(stats['unique_days'])
-        stats['unique_rooms'] = len(stats['unique_rooms'])
-        stats['unique_times'] = len(stats['unique_times'])
-        
-        return stats
     
     @staticmethod
     def create_calendar_view_data(schedule):
@@ -1,7 +1,26 @@
 import google.generativeai as genai
 import streamlit as st
 import json
-import time
+
+# Default resources offered to Gemini when the optimizer config has none
+PROMPT_DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+PROMPT_TIME_SLOTS = ["09:00", "10:00", "11:00", "12:00", "14:00", "15:00"]
+PROMPT_ROOMS = ["R101", "R102", "R103"]
+
+# Shape of the schedule Gemini must return in JSON mode
+SCHEDULE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "entity_id": {"type": "STRING"},
+            "day": {"type": "STRING"},
+            "time": {"type": "STRING"},
+            "room": {"type": "STRING"},
+        },
+        "required": ["entity_id", "day", "time", "room"],
+    },
+}
 
 
 class GeminiScheduler:
@@ -18,6 +37,9 @@ class GeminiScheduler:
             "top_p": 0.8,
             "top_k": 40,
             "max_output_tokens": 4096,  # Reduced to avoid issues
+            # JSON mode: the response is a bare array matching SCHEDULE_SCHEMA
+            "response_mime_type": "application/json",
+            "response_schema": SCHEDULE_SCHEMA,
         }
         
         # Safety settings to prevent blocking
@@ -112,18 +134,11 @@ class GeminiScheduler:
     def build_prompt(self, entities, constraints, context, config):
         """Build simplified prompt for Gemini"""
         
-        # Extract available resources
-        days = config.get("days", ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]) if config else ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
-        time_slots = config.get("time_slots", ["09:00", "10:00", "11:00", "12:00", "14:00", "15:00"]) if config else ["09:00", "10:00", "11:00", "12:00", "14:00", "15:00"]
-        rooms = config.get("rooms", ["R101", "R102", "R103"]) if config else ["R101", "R102", "R103"]
-        
-        # Limit to first 3 days and 6 time slots if too many
-        if len(days) > 5:
-            days = days[:5]
-        if len(time_slots) > 8:
-            time_slots = time_slots[:8]
-        if len(rooms) > 10:
-            rooms = rooms[:10]
+        # Extract available resources, limited to the first 5 days, 8 time slots and 10 rooms
+        config = config or {}
+        days = config.get("days", PROMPT_DAYS)[:5]
+        time_slots = config.get("time_slots", PROMPT_TIME_SLOTS)[:8]
+        rooms = config.get("rooms", PROMPT_ROOMS)[:10]
         
         return f"""Create a weekly timetable schedule.
 
@@ -133,7 +148,7 @@ Resources available:
 - Rooms: {', '.join(rooms)}
 
 Schedule these classes (first 30 shown):
-{json.dumps(entities[:30], indent=1)}
+{json.dumps(entities[:30], indent=1, separators=(',', ':'))}
 
 Rules:
 1. No room can have two classes at same time
@@ -153,30 +168,12 @@ No markdown, no explanation, only the JSON array:
     def parse_response(self, response_text, entities, config):
         """Parse Gemini response and extract JSON"""
         try:
-            # Remove markdown code blocks if present
-            text = response_text.strip()
-            if text.startswith("```") and text.endswith("```"):
-                lines = text.split('\n')
-                text = '\n'.join(lines[1:-1]) 
-                # Remove first and last line
-
-# Remove any remaining markdown fences
-            text = text.replace("```json", "").replace("```", "")
-
+            # JSON mode returns the bare array, without markdown fences or commentary
+            schedule = json.loads(response_text)
             
-            # Find JSON array
-            start = text.find('[')
-            end = text.rfind(']') + 1
-            
-            if start >= 0 and end > start:
-                json_str = text[start:end]
-                schedule = json.loads(json_str)
-                
+            if isinstance(schedule, list):
                 # Validate schedule has entity_ids
-                valid_schedule = []
-                for slot in schedule:
-                    if 'entity_id' in slot:
-                        valid_schedule.append(slot)
+                valid_schedule = [slot for slot in schedule if 'entity_id' in slot]
                 
                 if len(valid_schedule) == 0:
                     st.warning("⚠️ Gemini returned empty schedule. Using fallback.")
@@ -203,32 +200,15 @@ No markdown, no explanation, only the JSON array:
         time_slots = config.get("time_slots", ["09:00", "10:00", "11:00", "12:00", "14:00", "15:00", "16:00"]) if config else ["09:00", "10:00", "11:00", "12:00", "14:00", "15:00", "16:00"]
         rooms = config.get("rooms", ["R101", "R102", "R103", "R104"]) if config else ["R101", "R102", "R103", "R104"]
         
-        schedule = []
-        day_idx = 0
-        time_idx = 0
-        room_idx = 0
-        
-        for entity in entities:
-            # Simple round-robin scheduling
-            schedule.append({
-                "entity_id": entity["id"],
-                "day": days[day_idx % len(days)],
-                "time": time_slots[time_idx % len(time_slots)],
-                "room": rooms[room_idx % len(rooms)],
-                "duration": entity.get("duration", 1)
-            })
-            
-            # Move to next slot
-            room_idx += 1
-            if room_idx >= len(rooms):
-                room_idx = 0
-                time_idx += 1
-            
-            if time_idx >= len(time_slots):
-                time_idx = 0
-                day_idx += 1
-        
-        return schedule
+        # Simple round-robin scheduling: rooms cycle fastest, then time slots, then days
+        rooms_per_day = len(rooms) * len(time_slots)
+        return [{
+            "entity_id": entity["id"],
+            "day": days[idx // rooms_per_day % len(days)],
+            "time": time_slots[idx // len(rooms) % len(time_slots)],
+            "room": rooms[idx % len(rooms)],
+            "duration": entity.get("duration", 1)
+        } for idx, entity in enumerate(entities)]
     
     def analyze_schedule(self, schedule, constraints):
         """Get AI analysis of schedule quality"""
@@ -283,8 +263,6 @@ class HybridOptimizer:
         if progress_callback:
             progress_callback(0, 0, 0, 0, "Initializing Gemini AI...")
         
-        time.sleep(0.5)
-        
         if progress_callback:
             progress_callback(0, 0, 0, 0, "Sending request to Gemini API...")
         
@@ -301,8 +279,6 @@ class HybridOptimizer:
         if progress_callback:
             progress_callback(0, 0, 0, 0, "Processing response...")
         
-        time.sleep(0.3)
-        
         if progress_callback:
             progress_callback(0, 0, 0, 0, "Complete!")
         
@@ -355,8 +331,6 @@ class HybridOptimizer:
             seed_msg = "AI seed generated" if has_seed else "Skipping AI seed, using random init"
             progress_callback(0, 0, 0, 0, f"Phase 1: {seed_msg}")
         
-        time.sleep(0.3)
-        
         # Phase 2: GA optimization (main phase)
         if progress_callback:
             progress_callback(0, 0, 0, 0, "Phase 2: Starting genetic algorithm...")
@@ -1,8 +1,12 @@
 import random
+from collections import Counter
 import numpy as np
 from deap import base, creator, tools, algorithms
 import streamlit as st
 
+# Rows of an individual: each column holds one entity's day, time slot and room index
+DAY, TIME, ROOM = 0, 1, 2
+
 class ScheduleGA:
     """Genetic Algorithm for Schedule Optimization using DEAP"""
     
@@ -34,13 +38,59 @@ class ScheduleGA:
         # Mutation strategy
         self.config.setdefault("mutation_strategy", "swap")  # swap, shift, random
         
+        # Fitness memo for individuals seen in earlier generations (FIFO-evicted)
+        self.config.setdefault("fitness_cache_size", 10000)
+        
         # Time slots and resources (customizable)
         self.days = self.config.get("days", ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"])
         self.time_slots = self.config.get("time_slots", ["08:00", "09:00", "10:00", "11:00", "12:00", "13:00", "14:00", "15:00", "16:00", "17:00"])
         self.rooms = self.config.get("rooms", ["R101", "R102", "R103", "R104", "R105"])
         
+        # Entity data aligned with the columns of an individual
+        self.entity_columns = {}
+        for idx, entity in enumerate(self.entities):
+            self.entity_columns.setdefault(entity["id"], []).append(idx)
+        self.capacity_needed = np.array([entity.get("capacity_needed", 0) for entity in self.entities])
+        self.room_capacities = np.array([self.get_room_capacity(room) for room in self.rooms])
+        self.num_slots = len(self.days) * len(self.time_slots) * len(self.rooms)
+        self.entity_range = np.arange(len(self.entities))
+        self.rng = np.random.default_rng()
+        self.fitness_cache = {}
+        
+        # Availability/preference constraints folded into per-entity (day, time) lookup tables
+        self.unavailable_mask = self.build_slot_mask("availability", "unavailable_slots")
+        self.preferred_mask = self.build_slot_mask("preferred_time", "preferred_slots")
+        
+        # Aggregate constraints are scored once, weighted by how many times their type is listed
+        type_counts = Counter(constraint["type"] for constraint in self.constraints)
+        self.overlap_weight = type_counts["no_overlap"] * self.config["weight_no_overlap"]
+        self.capacity_weight = type_counts["room_capacity"] * self.config["weight_room_capacity"]
+        self.balance_weight = type_counts["balanced_distribution"] * self.config["weight_balanced_distribution"]
+        self.gap_weight = type_counts["minimize_gaps"] * self.config["weight_gap_penalty"]
+        self.consecutive_constraints = [c for c in self.constraints if c["type"] == "consecutive_slots"]
+        
         self.setup_deap()
     
+    def build_slot_mask(self, constraint_type, slots_field):
+        """Count, per entity column and (day, time), how many constraints of a type list that slot"""
+        typed_constraints = [c for c in self.constraints if c["type"] == constraint_type]
+        if not typed_constraints:
+            return None
+        
+        slot_index = {
+            f"{day}_{time}": (day_idx, time_idx)
+            for day_idx, day in enumerate(self.days)
+            for time_idx, time in enumerate(self.time_slots)
+        }
+        mask = np.zeros((len(self.entities), len(self.days), len(self.time_slots)), dtype=np.int16)
+        for constraint in typed_constraints:
+            columns = self.entity_columns.get(constraint.get("entity_id"), [])
+            for slot_key in set(constraint.get(slots_field, [])):
+                if slot_key in slot_index:
+                    day_idx, time_idx = slot_index[slot_key]
+                    mask[columns, day_idx, time_idx] += 1
+        return mask
+    
     def setup_deap(self):
         """Initialize DEAP framework"""
         # Clear any existing definitions
@@ -51,178 +101,148 @@ class ScheduleGA:
         
         # Create fitness and individual classes
         creator.create("FitnessMax", base.Fitness, weights=(1.0,))
-        creator.create("Individual", list, fitness=creator.FitnessMax)
+        creator.create("Individual", np.ndarray, fitness=creator.FitnessMax)
         
         # Initialize toolbox
         self.toolbox = base.Toolbox()
         
         # Register genetic operators
         self.toolbox.register("individual", self.create_individual)
-        self.toolbox.register("population", tools.initRepeat, list, self.toolbox.individual)
+        self.toolbox.register("population", self.create_population)
         self.toolbox.register("evaluate", self.evaluate_fitness)
-        self.toolbox.register("mate", tools.cxTwoPoint)
+        self.toolbox.register("mate", self.crossover_two_point)
         self.toolbox.register("mutate", self.mutate_schedule)
         self.toolbox.register("select", tools.selTournament, tournsize=self.config["tournament_size"])
     
     def create_individual(self):
-        """Create random schedule (individual)"""
-        schedule = []
-        for entity in self.entities:
-            gene = {
-                "entity_id": entity["id"],
-                "entity_name": entity.get("name", entity["id"]),
-                "day": random.choice(self.days),
-                "time": random.choice(self.time_slots),
-                "room": random.choice(self.rooms),
-                "duration": entity.get("duration", 2)
-            }
-            schedule.append(gene)
-        return creator.Individual(schedule)
+        """Create random schedule (individual) as a (3, entities) array of day/time/room indices"""
+        return self.create_population(1)[0]
+    
+    def create_population(self, n):
+        """Create n random individuals with one vectorized draw per day/time/room row"""
+        shape = (n, len(self.entities))
+        population = np.stack([
+            self.rng.integers(0, len(self.days), shape, dtype=np.int16),
+            self.rng.integers(0, len(self.time_slots), shape, dtype=np.int16),
+            self.rng.integers(0, len(self.rooms), shape, dtype=np.int16)
+        ], axis=1)
+        return [creator.Individual(individual) for individual in population]
+    
+    def decode_individual(self, individual):
+        """Convert an individual back to the list-of-dicts schedule used by the pages"""
+        return [{
+            "entity_id": entity["id"],
+            "entity_name": entity.get("name", entity["id"]),
+            "day": self.days[day],
+            "time": self.time_slots[time],
+            "room": self.rooms[room],
+            "duration": entity.get("duration", 2)
+        } for entity, day, time, room in zip(self.entities, *individual.tolist())]
+    
+    def crossover_two_point(self, ind1, ind2):
+        """Two-point crossover over entity columns (tools.cxTwoPoint swaps views on arrays)"""
+        size = ind1.shape[1]
+        cxpoint1 = random.randint(1, size)
+        cxpoint2 = random.randint(1, size - 1)
+        if cxpoint2 >= cxpoint1:
+            cxpoint2 += 1
+        else:
+            cxpoint1, cxpoint2 = cxpoint2, cxpoint1
+        
+        ind1[:, cxpoint1:cxpoint2], ind2[:, cxpoint1:cxpoint2] = \
+            ind2[:, cxpoint1:cxpoint2].copy(), ind1[:, cxpoint1:cxpoint2].copy()
+        return ind1, ind2
     
     def evaluate_fitness(self, individual):
         """Calculate fitness score based on constraints with configurable weights"""
-        score = 1000.0
+        return (float(self.evaluate_population(np.asarray(individual)[np.newaxis])[0]),)
+    
+    def evaluate_population(self, population):
+        """Calculate fitness scores for a stacked (P, 3, entities) population in one vectorized pass"""
+        score = np.full(len(population), 1000.0)
         
         # Hard constraints
-        for constraint in self.constraints:
-            if constraint["type"] == "no_overlap":
-                violations = self.check_overlaps(individual)
-                score -= violations * self.config["weight_no_overlap"]
-            
-            elif constraint["type"] == "room_capacity":
-                violations = self.check_room_capacity(individual)
-                score -= violations * self.config["weight_room_capacity"]
-            
-            elif constraint["type"] == "availability":
-                violations = self.check_availability(individual, constraint)
-                score -= violations * self.config["weight_availability"]
+        if self.overlap_weight:
+            score -= self.check_overlaps(population) * self.overlap_weight
+        if self.capacity_weight:
+            score -= self.check_room_capacity(population) * self.capacity_weight
+        if self.unavailable_mask is not None:
+            score -= self.check_availability(population) * self.config["weight_availability"]
         
         # Soft constraints (preferences)
-        for constraint in self.constraints:
-            if constraint["type"] == "preferred_time":
-                matches = self.check_preferred_times(individual, constraint)
-                score += matches * self.config["weight_preferred_time"]
-            
-            elif constraint["type"] == "balanced_distribution":
-                balance_score = self.check_balance(individual)
-                score += balance_score * self.config["weight_balanced_distribution"]
-            
-            elif constraint["type"] == "consecutive_slots":
-                bonus = self.check_consecutive_preference(individual, constraint)
-                score += bonus * self.config["weight_consecutive_slots"]
-            
-            elif constraint["type"] == "minimize_gaps":
-                gaps = self.check_gaps(individual)
-                score -= gaps * self.config["weight_gap_penalty"]
+        if self.preferred_mask is not None:
+            score += self.check_preferred_times(population) * self.config["weight_preferred_time"]
+        if self.balance_weight:
+            score += self.check_balance(population) * self.balance_weight
+        for constraint in self.consecutive_constraints:
+            score += self.check_consecutive_preference(population, constraint) * self.config["weight_consecutive_slots"]
+        if self.gap_weight:
+            score -= self.check_gaps(population) * self.gap_weight
         
         # Apply fitness method
         if self.config["fitness_method"] == "penalty_based":
             # Exponential penalty for violations
-            if score < 0:
-                score = 1000.0 / (1 + abs(score))
+            score = np.where(score < 0, 1000.0 / (1 + np.abs(score)), score)
         
-        return (max(score, 0),)
+        return np.maximum(score, 0)
+    
+    # The check_* methods take a stacked (P, 3, entities) population and return one value per individual
     
-    def check_overlaps(self, individual):
+    def check_overlaps(self, population):
         """Check for room/time conflicts"""
-        conflicts = 0
-        for i, slot1 in enumerate(individual):
-            for slot2 in individual[i+1:]:
-                if (slot1["day"] == slot2["day"] and 
-                    slot1["time"] == slot2["time"] and 
-                    slot1["room"] == slot2["room"]):
-                    conflicts += 1
-        return conflicts
+        # Encode each (day, time, room) as one slot number, offset per individual so
+        # a single bincount histograms the whole population
+        keys = (population[:, DAY].astype(np.int64) * len(self.time_slots) + population[:, TIME]) * len(self.rooms) + population[:, ROOM]
+        keys += np.arange(len(population))[:, np.newaxis] * self.num_slots
+        counts = np.bincount(keys.ravel(), minlength=len(population) * self.num_slots).reshape(len(population), -1)
+        
+        # k entities sharing a slot are k*(k-1)/2 conflicts
+        return (counts * (counts - 1) // 2).sum(axis=1)
     
-    def check_room_capacity(self, individual):
+    def check_room_capacity(self, population):
         """Check if room capacity constraints are met"""
-        violations = 0
-        for slot in individual:
-            entity = next((e for e in self.entities if e["id"] == slot["entity_id"]), None)
-            if entity:
-                required = entity.get("capacity_needed", 0)
-                room_capacity = self.get_room_capacity(slot["room"])
-                if required > room_capacity:
-                    violations += 1
-        return violations
+        return (self.capacity_needed > self.room_capacities[population[:, ROOM]]).sum(axis=1)
     
-    def check_availability(self, individual, constraint):
+    def check_availability(self, population):
         """Check entity availability constraints"""
-        violations = 0
-        entity_id = constraint.get("entity_id")
-        unavailable = constraint.get("unavailable_slots", [])
-        
-        for slot in individual:
-            if slot["entity_id"] == entity_id:
-                slot_key = f"{slot['day']}_{slot['time']}"
-                if slot_key in unavailable:
-                    violations += 1
-        return violations
+        if self.unavailable_mask is None:
+            return np.zeros(len(population), dtype=np.int64)
+        return self.unavailable_mask[self.entity_range, population[:, DAY], population[:, TIME]].sum(axis=1)
     
-    def check_preferred_times(self, individual, constraint):
+    def check_preferred_times(self, population):
         """Reward preferred time slot assignments"""
-        matches = 0
-        entity_id = constraint.get("entity_id")
-        preferred = constraint.get("preferred_slots", [])
-        
-        for slot in individual:
-            if slot["entity_id"] == entity_id:
-                slot_key = f"{slot['day']}_{slot['time']}"
-                if slot_key in preferred:
-                    matches += 1
-        return matches
+        if self.preferred_mask is None:
+            return np.zeros(len(population), dtype=np.int64)
+        return self.preferred_mask[self.entity_range, population[:, DAY], population[:, TIME]].sum(axis=1)
     
-    def check_balance(self, individual):
+    def check_balance(self, population):
         """Check workload distribution balance across days"""
-        day_counts = {day: 0 for day in self.days}
-        for slot in individual:
-            day_counts[slot["day"]] += 1
+        days = population[:, DAY].astype(np.int64) + np.arange(len(population))[:, np.newaxis] * len(self.days)
+        day_counts = np.bincount(days.ravel(), minlength=len(population) * len(self.days)).reshape(len(population), -1)
         
         # Calculate variance (lower is better)
-        variance = np.var(list(day_counts.values()))
+        variance = np.var(day_counts, axis=1)
         
         # Return negative variance as penalty (or use std deviation)
         balance_score = 100 / (1 + variance)
         return balance_score
     
-    def check_consecutive_preference(self, individual, constraint):
+    def check_consecutive_preference(self, population, constraint):
         """Reward consecutive time slots for same entity"""
-        bonus = 0
-        entity_id = constraint.get("entity_id")
-        
-        # Group slots by day for this entity
-        entity_slots = [s for s in individual if s["entity_id"] == entity_id]
-        
-        for day in self.days:
-            day_slots = sorted([s for s in entity_slots if s["day"] == day], 
-                              key=lambda x: self.time_slots.index(x["time"]))
-            
-            # Check for consecutive times
-            for i in range(len(day_slots) - 1):
-                time1_idx = self.time_slots.index(day_slots[i]["time"])
-                time2_idx = self.time_slots.index(day_slots[i+1]["time"])
-                if time2_idx == time1_idx + 1:
-                    bonus += 1
-        
-        return bonus
+        columns = self.entity_columns.get(constraint.get("entity_id"), [])
+        return self._count_day_steps(population[:, :, columns], lambda steps: steps == 1)
     
-    def check_gaps(self, individual):
+    def check_gaps(self, population):
         """Calculate gaps between slots in a day"""
-        total_gaps = 0
-        
-        for day in self.days:
-            day_slots = sorted([s for s in individual if s["day"] == day],
-                              key=lambda x: self.time_slots.index(x["time"]))
-            
-            if len(day_slots) > 1:
-                for i in range(len(day_slots) - 1):
-                    time1_idx = self.time_slots.index(day_slots[i]["time"])
-                    time2_idx = self.time_slots.index(day_slots[i+1]["time"])
-                    gap = time2_idx - time1_idx - 1
-                    if gap > 0:
-                        total_gaps += gap
-        
-        return total_gaps
+        return self._count_day_steps(population, lambda steps: np.maximum(steps - 1, 0))
+    
+    def _count_day_steps(self, population, score_steps):
+        """Sum score_steps over the time steps between each individual's consecutive slots within a day"""
+        # Sorting day*T + time orders slots by day, then time
+        keys = np.sort(population[:, DAY].astype(np.int64) * len(self.time_slots) + population[:, TIME], axis=1)
+        steps = np.diff(keys, axis=1)
+        same_day = keys[:, 1:] // len(self.time_slots) == keys[:, :-1] // len(self.time_slots)
+        return (score_steps(steps) * same_day).sum(axis=1)
     
     def get_room_capacity(self, room):
         """Get room capacity"""
@@ -234,62 +254,86 @@ class ScheduleGA:
     
     def mutate_schedule(self, individual):
         """Custom mutation operator with configurable strategy"""
+        mutated = False
         if random.random() < self.config["mutation_prob"]:
             strategy = self.config["mutation_strategy"]
+            mutated = strategy in ("shift", "random")
             
             if strategy == "swap":
-                # Swap two random genes
-                if len(individual) >= 2:
-                    i, j = random.sample(range(len(individual)), 2)
-                    individual[i], individual[j] = individual[j], individual[i]
+                # Swap the slots of two random entities
+                if individual.shape[1] >= 2:
+                    i, j = random.sample(range(individual.shape[1]), 2)
+                    individual[:, [i, j]] = individual[:, [j, i]]
+                    mutated = True
             
             elif strategy == "shift":
                 # Shift one gene to different time/day/room
-                idx = random.randint(0, len(individual) - 1)
+                idx = random.randint(0, individual.shape[1] - 1)
                 mutation_type = random.choice(["day", "time", "room"])
                 
                 if mutation_type == "day":
-                    individual[idx]["day"] = random.choice(self.days)
+                    individual[DAY, idx] = random.randrange(len(self.days))
                 elif mutation_type == "time":
-                    individual[idx]["time"] = random.choice(self.time_slots)
+                    individual[TIME, idx] = random.randrange(len(self.time_slots))
                 else:
-                    individual[idx]["room"] = random.choice(self.rooms)
+                    individual[ROOM, idx] = random.randrange(len(self.rooms))
             
             elif strategy == "random":
                 # Complete random reassignment
-                idx = random.randint(0, len(individual) - 1)
-                individual[idx]["day"] = random.choice(self.days)
-                individual[idx]["time"] = random.choice(self.time_slots)
-                individual[idx]["room"] = random.choice(self.rooms)
+                idx = random.randint(0, individual.shape[1] - 1)
+                individual[DAY, idx] = random.randrange(len(self.days))
+                individual[TIME, idx] = random.randrange(len(self.time_slots))
+                individual[ROOM, idx] = random.randrange(len(self.rooms))
+        
+        # Only a changed individual needs re-evaluating
+        if mutated:
+            del individual.fitness.values
         
         return (individual,)
     
+    def evaluate_invalid(self, individuals):
+        """Assign fitness to individuals, reusing cached scores and batch-evaluating the rest"""
+        uncached = []
+        for ind in individuals:
+            key = ind.tobytes()
+            fitness = self.fitness_cache.get(key)
+            if fitness is None:
+                uncached.append((ind, key))
+            else:
+                ind.fitness.values = fitness
+        
+        if not uncached:
+            return
+        
+        fitnesses = self.evaluate_population(np.stack([np.asarray(ind) for ind, _ in uncached]))
+        for (ind, key), fit in zip(uncached, fitnesses):
+            ind.fitness.values = (float(fit),)
+            self.fitness_cache[key] = ind.fitness.values
+            if len(self.fitness_cache) > self.config["fitness_cache_size"]:
+                del self.fitness_cache[next(iter(self.fitness_cache))]
+    
     def evolve(self, progress_callback=None):
         """Run genetic algorithm evolution with real-time progress"""
         population = self.toolbox.population(n=self.config["population_size"])
         
-        # Statistics tracking
-        stats = tools.Statistics(lambda ind: ind.fitness.values)
-        stats.register("avg", np.mean)
-        stats.register("max", np.max)
-        stats.register("min", np.min)
-        stats.register("std", np.std)
-        
-        # Hall of fame (best individuals)
-        hof = tools.HallOfFame(1)
+        # Hall of fame (best individuals); arrays need an element-wise equality check
+        hof = tools.HallOfFame(1, similar=np.array_equal)
         
         history = []
+        elite_count = max(1, int(len(population) * self.config["elitism_rate"]))
         
         # Evolution loop
         for gen in range(self.config["generations"]):
-            # Evaluate population
-            fitnesses = map(self.toolbox.evaluate, population)
-            for ind, fit in zip(population, fitnesses):
-                ind.fitness.values = fit
+            # Evaluate individuals changed by crossover or mutation; untouched clones and elites keep theirs
+            self.evaluate_invalid([ind for ind in population if not ind.fitness.valid])
             
-            # Update statistics
-            record = stats.compile(population)
-            hof.update(population)
+            # Elites: the top elite_count by fitness, via a partial sort
+            fits = np.array([ind.fitness.values[0] for ind in population])
+            elites = [population[idx] for idx in np.argpartition(-fits, elite_count - 1)[:elite_count]]
+            
+            # Update statistics from the same fitness vector; the overall best is always among the elites
+            record = {"avg": np.mean(fits), "max": np.max(fits), "min": np.min(fits), "std": np.std(fits)}
+            hof.update(elites)
             
             history.append({
                 "generation": gen,
@@ -311,10 +355,6 @@ class ScheduleGA:
             offspring = self.toolbox.select(population, len(population))
             offspring = list(map(self.toolbox.clone, offspring))
             
-            # Apply elitism
-            elite_count = max(1, int(len(population) * self.config["elitism_rate"]))
-            elites = tools.selBest(population, elite_count)
-            
             # Crossover
             for child1, child2 in zip(offspring[::2], offspring[1::2]):
                 if random.random() < self.config["crossover_prob"]:
@@ -325,7 +365,6 @@ class ScheduleGA:
             # Mutation
             for mutant in offspring:
                 self.toolbox.mutate(mutant)
-                del mutant.fitness.values
             
             # Replace population with offspring + elites
             population[:] = offspring[:-elite_count] + elites
@@ -333,7 +372,7 @@ class ScheduleGA:
         # Return best solution
         best = hof[0]
         return {
-            "schedule": list(best),
+            "schedule": self.decode_individual(best),
             "fitness": best.fitness.values[0],
             "history": history,
             "config_used": self.config
@@ -1,6 +1,7 @@
 import streamlit as st
 from lib.database import get_database
 from datetime import datetime
+import time
 import json
 
 st.set_page_config(page_title="Setup Wizard", page_icon="⚙️", layout="wide")
@@ -12,7 +13,8 @@ if not st.session_state.get("authenticated"):
 
 # Update activity
 if 'last_activity' in st.session_state:
-    st.session_state.last_activity = datetime.now()
+    st.session_state.last_activity = time.monotonic()
+    st.session_state.last_activity_wall = time.time()
 
 db = get_database()
 user = st.session_state.user
@@ -208,12 +210,20 @@ with tab2:
                     
                     st.divider()
                     
-                    # Check dependencies
-                    faculty_in_dept = db.get_all_faculty(department_id=dept['id'])
-                    programs_in_dept = db.get_all_programs(department_id=dept['id'])
+                    # Check dependencies, inactive rows included: foreign keys still point at them
+                    with db.get_connection(readonly=True) as conn:
+                        cursor = conn.cursor()
+                        cursor.execute("SELECT COUNT(*) as count FROM faculty WHERE department_id = ?", (dept['id'],))
+                        faculty_in_dept = cursor.fetchone()['count']
+                        
+                        cursor.execute("SELECT COUNT(*) as count FROM programs WHERE department_id = ?", (dept['id'],))
+                        programs_in_dept = cursor.fetchone()['count']
+                        
+                        cursor.execute("SELECT COUNT(*) as count FROM subjects WHERE department_id = ?", (dept['id'],))
+                        subjects_in_dept = cursor.fetchone()['count']
                     
-                    if faculty_in_dept or programs_in_dept:
-                        st.warning(f"⚠️ Cannot delete: {len(faculty_in_dept)} faculty and {len(programs_in_dept)} programs linked")
+                    if faculty_in_dept or programs_in_dept or subjects_in_dept:
+                        st.warning(f"⚠️ Cannot delete: {faculty_in_dept} faculty, {programs_in_dept} programs and {subjects_in_dept} subjects linked")
                     else:
                         if st.button(f"🗑️ Delete {dept['dept_code']}", key=f"del_dept_{dept['id']}", type="secondary"):
                             with db.get_connection() as conn:
@@ -295,13 +305,16 @@ with tab3:
                         st.divider()
                         
                         # Check if room is being used in any timetable
-                        with db.get_connection() as conn:
+                        with db.get_connection(readonly=True) as conn:
                             cursor = conn.cursor()
                             cursor.execute("SELECT COUNT(*) as count FROM timetable_sessions WHERE room_id = ?", (room['id'],))
                             usage = cursor.fetchone()['count']
+                            
+                            cursor.execute("SELECT COUNT(*) as count FROM subjects WHERE preferred_lab_id = ?", (room['id'],))
+                            subject_links = cursor.fetchone()['count']
                         
-                        if usage > 0:
-                            st.warning(f"⚠️ Cannot delete: Used in {usage} timetable session(s)")
+                        if usage > 0 or subject_links > 0:
+                            st.warning(f"⚠️ Cannot delete: Used in {usage} sessions and {subject_links} subject(s)")
                         else:
                             col_del1, col_del2 = st.columns(2)
                             with col_del1:
@@ -388,7 +401,7 @@ with tab3:
                         st.divider()
                         
                         # Check usage
-                        with db.get_connection() as conn:
+                        with db.get_connection(readonly=True) as conn:
                             cursor = conn.cursor()
                             cursor.execute("SELECT COUNT(*) as count FROM timetable_sessions WHERE room_id = ?", (lab['id'],))
                             usage = cursor.fetchone()['count']
@@ -521,7 +534,7 @@ with tab4:
                             st.metric("Max Hrs/Day", faculty['max_hours_per_day'])
                         
                         # Show workload
-                        workload = db.calculate_faculty_workload(faculty['id'])
+                        workload = db.calculate_faculty_workload(faculty['id'], include_allocations=False)
                         st.progress(min(workload['total_hours'] / faculty['max_hours_per_week'], 1.0))
                         st.caption(f"Current Load: {workload['total_hours']}/{faculty['max_hours_per_week']} hours")
                         
@@ -530,7 +543,7 @@ with tab4:
                         # Check dependencies
                         allocations = db.get_allocations_by_faculty(faculty['id'])
                         
-                        with db.get_connection() as conn:
+                        with db.get_connection(readonly=True) as conn:
                             cursor = conn.cursor()
                             cursor.execute("SELECT COUNT(*) as count FROM timetable_sessions WHERE faculty_id = ?", (faculty['id'],))
                             sessions = cursor.fetchone()['count']
@@ -616,11 +629,14 @@ with tab5:
                             
                             st.divider()
                             
-                            # Check dependencies
-                            batches_in_prog = db.get_all_batches(program_id=prog['id'])
+                            # Check dependencies, inactive batches included
+                            with db.get_connection(readonly=True) as conn:
+                                cursor = conn.cursor()
+                                cursor.execute("SELECT COUNT(*) as count FROM batches WHERE program_id = ?", (prog['id'],))
+                                batches_in_prog = cursor.fetchone()['count']
                             
                             if batches_in_prog:
-                                st.warning(f"⚠️ Cannot delete: {len(batches_in_prog)} batch(es) linked to this program")
+                                st.warning(f"⚠️ Cannot delete: {batches_in_prog} batch(es) linked to this program")
                             else:
                                 if st.button(f"🗑️ Delete {prog['program_code']}", key=f"del_prog_{prog['id']}", type="secondary", use_container_width=True):
                                     with db.get_connection() as conn:
@@ -717,7 +733,7 @@ with tab5:
                                 # Check dependencies
                                 allocations = db.get_allocations_by_batch(batch['id'])
                                 
-                                with db.get_connection() as conn:
+                                with db.get_connection(readonly=True) as conn:
                                     cursor = conn.cursor()
                                     cursor.execute("SELECT COUNT(*) as count FROM timetable_sessions WHERE batch_id = ?", (batch['id'],))
                                     sessions = cursor.fetchone()['count']
@@ -862,7 +878,7 @@ with tab6:
                         st.divider()
                         
                         # Check dependencies
-                        with db.get_connection() as conn:
+                        with db.get_connection(readonly=True) as conn:
                             cursor = conn.cursor()
                             cursor.execute("SELECT COUNT(*) as count FROM subject_allocation WHERE subject_id = ?", (subject['id'],))
                             allocations = cursor.fetchone()['count']
@@ -968,7 +984,7 @@ with tab7:
                             st.divider()
                             
                             # Check if allocation is used in timetable
-                            with db.get_connection() as conn:
+                            with db.get_connection(readonly=True) as conn:
                                 cursor = conn.cursor()
                                 cursor.execute("""
                                     SELECT COUNT(*) as count FROM timetable_sessions 
@@ -1020,7 +1036,7 @@ with tab7:
                             st.divider()
                             
                             # Check usage
-                            with db.get_connection() as conn:
+                            with db.get_connection(readonly=True) as conn:
                                 cursor = conn.cursor()
                                 cursor.execute("""
                                     SELECT COUNT(*) as count FROM timetable_sessions 
@@ -1032,7 +1048,7 @@ with tab7:
                                 st.warning(f"⚠️ Cannot delete: Used in {sessions} session(s)")
                             else:
                                 # Get allocation ID
-                                with db.get_connection() as conn:
+                                with db.get_connection(readonly=True) as conn:
                                     cursor = conn.cursor()
                                     cursor.execute("""
                                         SELECT id FROM subject_allocation 
@@ -4,6 +4,7 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
+import time
 
 st.set_page_config(page_title="Dashboard", page_icon="📊", layout="wide")
 
@@ -14,7 +15,8 @@ if not st.session_state.get("authenticated"):
 
 # Update activity
 if 'last_activity' in st.session_state:
-    st.session_state.last_activity = datetime.now()
+    st.session_state.last_activity = time.monotonic()
+    st.session_state.last_activity_wall = time.time()
 
 db = get_database()
 user = st.session_state.user
@@ -28,8 +30,8 @@ def get_cached_schedules(user_id, cache_key):
 def clear_cache():
     """Clear dashboard cache"""
     st.cache_data.clear()
-    if 'cache_timestamp' in st.session_state:
-        st.session_state.cache_timestamp = datetime.now()
+    if 'cache_version' in st.session_state:
+        st.session_state.cache_version += 1
 
 # Header
 st.title("📊 Schedule Dashboard")
@@ -45,7 +47,7 @@ with col3:
 st.divider()
 
 # Get schedules
-cache_key = st.session_state.get('cache_timestamp', datetime.now())
+cache_key = st.session_state.get('cache_version', 0)
 schedules = get_cached_schedules(user['id'], cache_key)
 
 # Statistics
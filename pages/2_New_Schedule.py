@@ -2,7 +2,7 @@ import streamlit as st
 from lib.database import get_database
 import uuid
 import json
-from datetime import datetime
+import time
 
 st.set_page_config(page_title="New Schedule", page_icon="✨", layout="wide")
 
@@ -13,7 +13,8 @@ if not st.session_state.get("authenticated"):
 
 # Update activity
 if 'last_activity' in st.session_state:
-    st.session_state.last_activity = datetime.now()
+    st.session_state.last_activity = time.monotonic()
+    st.session_state.last_activity_wall = time.time()
 
 db = get_database()
 user = st.session_state.user
@@ -1,5 +1,5 @@
 import streamlit as st
-from lib.database import get_database
+from lib.database import get_database, SESSION_CONFLICTS
 from lib.genetic_algo import ScheduleGA
 from lib.gemini_ai import HybridOptimizer, GeminiScheduler
 import plotly.graph_objects as go
@@ -19,7 +19,8 @@ if not st.session_state.get("authenticated"):
 
 # Update activity
 if 'last_activity' in st.session_state:
-    st.session_state.last_activity = datetime.now()
+    st.session_state.last_activity = time.monotonic()
+    st.session_state.last_activity_wall = time.time()
 
 db = get_database()
 user = st.session_state.user
@@ -185,6 +186,11 @@ st.caption("Select the batches/classes that should be included in this timetable
 programs = db.get_all_programs()
 batch_selection = {}
 
+# One query for every batch instead of one per program
+batches_by_program = {}
+for batch in db.get_all_batches_with_details():
+    batches_by_program.setdefault(batch['program_id'], []).append(batch)
+
 # Get previously selected batches if editing
 previously_selected = []
 if edit_mode and existing_sessions:
@@ -192,7 +198,7 @@ if edit_mode and existing_sessions:
 
 for program in programs:
     with st.expander(f"📚 {program['program_name']}", expanded=True):
-        program_batches = db.get_all_batches(program_id=program['id'])
+        program_batches = batches_by_program.get(program['id'], [])
         
         if program_batches:
             cols = st.columns(min(len(program_batches), 4))
@@ -226,11 +232,8 @@ st.divider()
 
 st.markdown("### ⚙️ Timetable Configuration")
 
-# Get allocations for selected batches
-all_allocations = []
-for batch in selected_batches:
-    allocations = db.get_allocations_by_batch(batch['id'], semester)
-    all_allocations.extend(allocations)
+# Get allocations for selected batches, with subject and lab details pre-joined
+all_allocations = db.get_allocations_with_room([b['id'] for b in selected_batches], semester)
 
 if not all_allocations:
     st.warning(f"⚠️ No subject allocations found for selected batches in Semester {semester}")
@@ -276,7 +279,6 @@ st.markdown("### 📊 Generating Weekly Sessions")
 
 for alloc in all_allocations:
     batch = next(b for b in selected_batches if b['id'] == alloc['batch_id'])
-    subject = db.get_subject_with_lab(alloc['subject_id'])
     faculty = next(f for f in faculty_list if f['id'] == alloc['faculty_id'])
     
     # Create WEEKLY theory sessions (recurring)
@@ -285,7 +287,7 @@ for alloc in all_allocations:
             entity_id = f"theory_{alloc['id']}_{session_num}"
             entities.append({
                 "id": entity_id,
-                "name": f"{subject['subject_name']} - Lecture {session_num + 1}",
+                "name": f"{alloc['subject_name']} - Lecture {session_num + 1}",
                 "allocation_id": alloc['id'],
                 "subject_id": alloc['subject_id'],
                 "subject_code": alloc['subject_code'],
@@ -312,7 +314,7 @@ for alloc in all_allocations:
             entity_id = f"lab_{alloc['id']}_{session_num}"
             entities.append({
                 "id": entity_id,
-                "name": f"{subject['subject_name']} - Lab Session {session_num + 1}",
+                "name": f"{alloc['subject_name']} - Lab Session {session_num + 1}",
                 "allocation_id": alloc['id'],
                 "subject_id": alloc['subject_id'],
                 "subject_code": alloc['subject_code'],
@@ -324,7 +326,7 @@ for alloc in all_allocations:
                 "duration": hours_per_lab,
                 "capacity_needed": batch['num_students'],
                 "requires_lab": True,
-                "preferred_lab_id": subject.get('preferred_lab_id'),
+                "preferred_lab_id": alloc.get('preferred_lab_id'),
                 "consecutive_hours": True,
                 "preferred_room_type": "Lab",
                 "recurring": True,
@@ -718,39 +720,26 @@ with col2:
                 # Delete old sessions
                 db.delete_timetable_sessions_by_schedule(schedule_id)
                 
-                # Update metadata with semester info
-                metadata = {
-                    'num_weeks': num_weeks,
-                    'start_date': str(start_date) if start_date else None,
-                    'end_date': str(end_date) if end_date else None,
-                    'recurring_weekly': True
-                }
-                description_with_meta = f"{existing_schedule.get('description', '').split('[META]')[0]}\n[META]{json.dumps(metadata)}[/META]"
-                
-                # Update metadata
+                # Update schedule with semester info
                 db.update_schedule(schedule_id, {
                     'title': schedule_title,
-                    'description': description_with_meta,
                     'semester': semester,
                     'academic_year': academic_year,
-                    'status': 'optimizing'
-                })
-            else:
-                # Create metadata
-                metadata = {
                     'num_weeks': num_weeks,
                     'start_date': str(start_date) if start_date else None,
                     'end_date': str(end_date) if end_date else None,
-                    'recurring_weekly': True
-                }
-                description_with_meta = f"Timetable for {len(selected_batches)} batch(es) - Semester {semester}\n[META]{json.dumps(metadata)}[/META]"
-                
+                    'status': 'optimizing'
+                })
+            else:
                 schedule_id = db.create_schedule(
                     owner_id=user['id'],
                     title=schedule_title,
-                    description=description_with_meta,
+                    description=f"Timetable for {len(selected_batches)} batch(es) - Semester {semester}",
                     semester=semester,
-                    academic_year=academic_year
+                    academic_year=academic_year,
+                    num_weeks=num_weeks,
+                    start_date=start_date,
+                    end_date=end_date
                 )
             
             st.session_state.optimization_running = True
@@ -840,6 +829,9 @@ with col2:
                     # Map result to timetable sessions
                     sessions_created = 0
                     conflicts_detected = []
+                    new_sessions = []
+                    # Sessions queued in this run are not in the database yet
+                    booked_slots = set()
                     
                     # Get infrastructure for room allocation
                     all_rooms = db.get_all_infrastructure()
@@ -890,16 +882,24 @@ with col2:
                         
                         # Check for conflicts
                         check_conflicts = db.check_session_conflicts(session_data)
+                        found_types = {c['type'] for c in check_conflicts}
+                        
+                        for conflict_type, column, message in SESSION_CONFLICTS:
+                            key = (column, session_data[column], slot['day'], slot['time'])
+                            if key in booked_slots and conflict_type not in found_types:
+                                check_conflicts.append({'type': conflict_type, 'message': message})
+                            booked_slots.add(key)
                         
                         if check_conflicts:
                             conflicts_detected.extend(check_conflicts)
                         
-                        # Create session
-                        try:
-                            db.create_timetable_session(session_data)
-                            sessions_created += 1
-                        except Exception as e:
-                            print(f"❌ Failed to create session: {e}")
+                        new_sessions.append(session_data)
+                    
+                    # Create sessions
+                    try:
+                        sessions_created = len(db.create_timetable_sessions_bulk(new_sessions))
+                    except Exception as e:
+                        print(f"❌ Failed to create sessions: {e}")
                     
                     progress_bar.progress(1.0)
                     
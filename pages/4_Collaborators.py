@@ -12,7 +12,8 @@ if not st.session_state.get("authenticated"):
 
 # Update activity
 if 'last_activity' in st.session_state:
-    st.session_state.last_activity = datetime.now()
+    st.session_state.last_activity = time.monotonic()
+    st.session_state.last_activity_wall = time.time()
 
 db = get_database()
 user = st.session_state.user
@@ -243,6 +244,8 @@ with tab1:
 with tab2:
     st.markdown("### My Collaborators Overview")
     
+    collaborators_by_schedule = db.get_collaborators_by_schedule([s['id'] for s in owned_schedules])
+    
     if not owned_schedules:
         st.info("📭 You don't own any schedules yet")
     else:
@@ -250,7 +253,7 @@ with tab2:
         all_collaborators = {}
         
         for schedule in owned_schedules:
-            collaborators = db.get_schedule_collaborators(schedule['id'])
+            collaborators = collaborators_by_schedule[schedule['id']]
             
             for collab in collaborators:
                 user_email = collab['email']
@@ -422,8 +425,7 @@ with st.sidebar:
     # Count total shares
     total_shared_by_me = 0
     for schedule in owned_schedules:
-        collaborators = db.get_schedule_collaborators(schedule['id'])
-        total_shared_by_me += len(collaborators)
+        total_shared_by_me += len(collaborators_by_schedule[schedule['id']])
     
     col1, col2 = st.columns(2)
     
@@ -1,12 +1,10 @@
 import streamlit as st
 from lib.database import get_database
-from lib.export_utils import ScheduleExporter
+from lib.export_utils import ScheduleExporter, JSON_EXPORT_FORMATS
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime
-import json
-import re
+import time
 
 st.set_page_config(page_title="View Timetable", page_icon="📅", layout="wide")
 
@@ -17,7 +15,8 @@ if not st.session_state.get("authenticated"):
 
 # Update activity
 if 'last_activity' in st.session_state:
-    st.session_state.last_activity = datetime.now()
+    st.session_state.last_activity = time.monotonic()
+    st.session_state.last_activity_wall = time.time()
 
 db = get_database()
 user = st.session_state.user
@@ -71,24 +70,14 @@ with col3:
         st.switch_page("pages/3_Optimizer.py")
 
 # Get schedule details
-schedule = db.get_schedule(schedule_id)
-sessions = db.get_timetable_sessions(schedule_id=schedule_id)
-
-# Extract metadata
-num_weeks = 16
-start_date = None
-end_date = None
-
-if schedule and schedule.get('description'):
-    try:
-        meta_match = re.search(r'\[META\](.*?)\[/META\]', schedule.get('description', '') or '')
-        if meta_match:
-            metadata = json.loads(meta_match.group(1))
-            num_weeks = metadata.get('num_weeks', 16)
-            start_date = metadata.get('start_date')
-            end_date = metadata.get('end_date')
-    except:
-        pass
+schedule_data = db.get_schedule_with_sessions(schedule_id)
+schedule = schedule_data['schedule']
+sessions = schedule_data['sessions']
+
+# Semester info
+num_weeks = (schedule.get('num_weeks') if schedule else None) or 16
+start_date = schedule.get('start_date') if schedule else None
+end_date = schedule.get('end_date') if schedule else None
 
 # Display semester info
 st.info(f"""
@@ -555,6 +544,8 @@ with tab5:
         'start_date': start_date,
         'end_date': end_date
     }
+    # Shared by the Excel and JSON exports, which both work from the sessions
+    export_stats = ScheduleExporter.calculate_statistics(sessions)
     
     with col1:
         st.markdown("#### 📄 PDF Export")
@@ -586,7 +577,7 @@ with tab5:
         st.markdown("#### 📊 Excel Export")
         if st.button("Generate Excel", use_container_width=True):
             with st.spinner("Generating Excel..."):
-                excel_buffer = ScheduleExporter.export_to_excel(sessions, metadata)
+                excel_buffer = ScheduleExporter.export_to_excel(sessions, metadata, stats=export_stats)
                 
                 st.download_button(
                     "📥 Download Excel",
@@ -598,13 +589,21 @@ with tab5:
     
     with col3:
         st.markdown("#### 📋 JSON Export")
-        json_data = ScheduleExporter.export_to_json(sessions, metadata)
+        json_compress = st.selectbox(
+            "Compression",
+            list(JSON_EXPORT_FORMATS),
+            format_func=lambda option: option or "None (pretty-printed)",
+            key="json_export_compress"
+        )
+        json_data = ScheduleExporter.export_to_json(sessions, metadata, stats=export_stats,
+                                                    compress=json_compress)
+        json_suffix, json_mime = JSON_EXPORT_FORMATS[json_compress]
         
         st.download_button(
             "📥 Download JSON",
             data=json_data,
-            file_name=f"{metadata['title']}.json",
-            mime="application/json",
+            file_name=f"{metadata['title']}{json_suffix}",
+            mime=json_mime,
             use_container_width=True
         )
     
@@ -622,43 +621,29 @@ with tab5:
     
     with col2:
         if st.button("📋 Duplicate", use_container_width=True):
-            # Extract metadata from existing schedule
-            num_weeks_dup = 16
-            start_date_dup = None
-            end_date_dup = None
-            
-            if schedule and schedule.get('description'):
-                try:
-                    meta_match = re.search(r'\[META\](.*?)\[/META\]', schedule.get('description', '') or '')
-                    if meta_match:
-                        metadata = json.loads(meta_match.group(1))
-                        num_weeks_dup = metadata.get('num_weeks', 16)
-                        start_date_dup = metadata.get('start_date')
-                        end_date_dup = metadata.get('end_date')
-                except:
-                    pass
-            
             new_id = db.create_schedule(
                 owner_id=user['id'],
                 title=f"{schedule.get('title', 'Timetable') if schedule else 'Timetable'} (Copy)",
                 description=schedule.get('description', '') if schedule else '',
                 semester=schedule.get('semester', None) if schedule else None,
-                academic_year=schedule.get('academic_year', None) if schedule else None
+                academic_year=schedule.get('academic_year', None) if schedule else None,
+                num_weeks=num_weeks,
+                start_date=start_date,
+                end_date=end_date
             )
             
             # Copy sessions
-            for session in sessions:
-                db.create_timetable_session({
-                    'schedule_id': new_id,
-                    'subject_id': session['subject_id'],
-                    'batch_id': session['batch_id'],
-                    'faculty_id': session['faculty_id'],
-                    'room_id': session['room_id'],
-                    'day_of_week': session['day_of_week'],
-                    'time_slot': session['time_slot'],
-                    'duration': session.get('duration', 1),
-                    'session_type': session['session_type']
-                })
+            db.create_timetable_sessions_bulk([{
+                'schedule_id': new_id,
+                'subject_id': session['subject_id'],
+                'batch_id': session['batch_id'],
+                'faculty_id': session['faculty_id'],
+                'room_id': session['room_id'],
+                'day_of_week': session['day_of_week'],
+                'time_slot': session['time_slot'],
+                'duration': session.get('duration', 1),
+                'session_type': session['session_type']
+            } for session in sessions])
             
             st.success("✅ Timetable duplicated!")
             st.rerun()
@@ -0,0 +1,77 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import bcrypt
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmpdir = None
+_cwd = None
+
+
+def setUpModule():
+    """Point st.secrets at a throwaway database before lib.database is imported"""
+    global _tmpdir, _cwd
+    _cwd = os.getcwd()
+    _tmpdir = tempfile.TemporaryDirectory()
+    os.makedirs(os.path.join(_tmpdir.name, '.streamlit'))
+    with open(os.path.join(_tmpdir.name, '.streamlit', 'secrets.toml'), 'w') as f:
+        f.write('[database]\npath = "test.db"\n[app]\nbcrypt_cost = 5\n')
+    os.chdir(_tmpdir.name)
+
+
+def tearDownModule():
+    from lib.database import get_database
+    get_database().close()
+    os.chdir(_cwd)
+    _tmpdir.cleanup()
+
+
+def login(db, email, password):
+    """Same checks and rehash as app.authenticate, without the Streamlit session"""
+    from lib.database import hash_password, verify_password, password_needs_rehash
+    user = db.get_user_by_email(email)
+    if not user or not verify_password(password, user['password']):
+        return None
+    if password_needs_rehash(user['password']):
+        user['password'] = hash_password(password)
+        db.update_password(user['id'], user['password'])
+    return user
+
+
+class RehashLoginTest(unittest.TestCase):
+    def setUp(self):
+        from lib.database import get_database
+        self.db = get_database()
+
+    def test_login_twice_across_rehash(self):
+        """A hash upgraded on login still verifies on the next login"""
+        user_id = self.db.create_user("old", "old@example.com", "secret1")
+        # Store a hash made at a lower cost, as an older deployment would have
+        old_hash = bcrypt.hashpw(b"secret1", bcrypt.gensalt(4))
+        self.db.update_password(user_id, old_hash)
+
+        first = login(self.db, "old@example.com", "secret1")
+        self.assertIsNotNone(first)
+        self.assertNotEqual(first['password'], old_hash)
+
+        second = login(self.db, "old@example.com", "secret1")
+        self.assertIsNotNone(second)
+        self.assertEqual(second['password'], first['password'])
+        self.assertIsNone(login(self.db, "old@example.com", "wrong"))
+
+    def test_blob_hash_still_loads(self):
+        """Hashes written as BLOBs by the earlier rehash path are still accepted"""
+        user_id = self.db.create_user("blob", "blob@example.com", "secret1")
+        with self.db.get_connection() as conn:
+            conn.execute('UPDATE users SET password = ? WHERE id = ?',
+                         (bcrypt.hashpw(b"secret1", bcrypt.gensalt(5)), user_id))
+
+        self.assertIsNotNone(login(self.db, "blob@example.com", "secret1"))
+
+
+if __name__ == '__main__':
+    unittest.main()